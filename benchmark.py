@@ -0,0 +1,251 @@
+"""Benchmarks simulation throughput and scaling.
+
+Runs headless simulations with fixed seeds over grids of population size,
+food number and food regeneration rate, reporting frames per second,
+individual steps per second and peak traced memory. Each case is timed on
+an untraced run and then run again under tracemalloc for its peak memory, so
+tracing does not slow the timings. The object-oriented population is timed
+running several populations in one process, and its update_position and
+add_individual_to_data methods are also timed on their own. Results are
+saved as JSON so that runs from different versions can be compared, e.g.
+
+    python benchmark.py --output new.json --compare old.json
+"""
+import argparse
+import itertools
+import json
+import time
+import tracemalloc
+
+from genetic_algorithm_2 import population, run_populations
+from vectorised_population import vectorised_population
+
+
+def measure(run, memory=True, setup=None):
+    """Times an untraced call of run, then calls it again under tracemalloc
+    for its peak memory if memory. Given setup, it is called untimed and
+    untraced before each call of run, which is passed what it returns.
+    Returns what the timed call returned, the seconds it took and the peak
+    memory, which is NaN when not measured
+    """
+    arguments = setup() if setup is not None else ()
+    start = time.perf_counter()
+    result = run(*arguments)
+    seconds = time.perf_counter() - start
+    peak_memory = float('nan')
+    if memory:
+        arguments = setup() if setup is not None else ()
+        tracemalloc.start()
+        try:
+            run(*arguments)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak_memory
+
+
+def benchmark_simulation(pop_size, food_number, food_regen, frames, seed=0,
+                         memory=True):
+    """Times a headless run of the vectorised population
+    """
+    def run():
+        pop = vectorised_population(pop_size, food_number, food_regen,
+                                    seed=seed)
+        pop.simulate(max_frames=frames)
+        return pop
+    pop, seconds, peak_memory = measure(run, memory)
+
+    individual_steps = int(pop.macro_store.column('population').sum())
+    return {'benchmark': 'simulate',
+            'pop_size': pop_size,
+            'food_number': food_number,
+            'food_regen': food_regen,
+            'frames': pop.frame_no,
+            'seconds': seconds,
+            'frames_per_sec': pop.frame_no / seconds,
+            'steps_per_sec': individual_steps / seconds,
+            'peak_memory_mb': peak_memory / 2**20}
+
+
+def benchmark_object_populations(pop_size, food_number, food_regen, frames,
+                                 populations, seed=0, memory=True):
+    """Times headless runs of several object-oriented populations stepped
+    in turn in this process
+    """
+    def run():
+        pops = [population(pop_size, food_number, food_regen, seed=seed + i)
+                for i in range(populations)]
+        run_populations(pops, max_frames=frames)
+        return pops
+    pops, seconds, peak_memory = measure(run, memory)
+
+    total_frames = sum(pop.frame_no for pop in pops)
+    individual_steps = sum(int(pop.macro_store.column('population').sum())
+                           for pop in pops)
+    return {'benchmark': 'object_populations',
+            'pop_size': pop_size,
+            'food_number': food_number,
+            'food_regen': food_regen,
+            'populations': populations,
+            'frames': total_frames,
+            'seconds': seconds,
+            'frames_per_sec': total_frames / seconds,
+            'steps_per_sec': individual_steps / seconds,
+            'peak_memory_mb': peak_memory / 2**20}
+
+
+def started_population(pop_size, food_number, seed, **kwargs):
+    """A headless object-oriented population with its individuals and food
+    created, ready to be stepped
+    """
+    pop = population(pop_size, food_number, 0, seed=seed, **kwargs)
+    pop.start(headless=True)
+    return pop
+
+
+def benchmark_add_individual_to_data(rows, seed=0, memory=True):
+    """Times population.add_individual_to_data recording the deaths of rows
+    individuals of a started population keeping lineage, then reading the
+    data back
+    """
+    def setup():
+        pop = started_population(rows, 0, seed, lineage=True)
+        individuals = list(pop.individuals)
+        for ind in individuals:
+            ind.alive = False
+        return pop, individuals
+
+    def run(pop, individuals):
+        for ind in individuals:
+            pop.add_individual_to_data(ind)
+        pop.past_individual_data
+    _, seconds, peak_memory = measure(run, memory, setup)
+
+    return {'benchmark': 'add_individual_to_data',
+            'rows': rows,
+            'seconds': seconds,
+            'rows_per_sec': rows / seconds,
+            'peak_memory_mb': peak_memory / 2**20}
+
+
+def benchmark_update_position(pop_size, food_number, steps, seed=0,
+                              memory=True):
+    """Times individual.update_position alone, stepping every individual of
+    a started population steps times without the rest of the frame
+    """
+    def setup():
+        pop = started_population(pop_size, food_number, seed)
+        return pop,
+
+    def run(pop):
+        calls = 0
+        for step in range(steps):
+            individuals = list(pop.individuals)
+            for ind in individuals:
+                ind.update_position()
+            calls += len(individuals)
+        return calls
+    calls, seconds, peak_memory = measure(run, memory, setup)
+
+    return {'benchmark': 'update_position',
+            'pop_size': pop_size,
+            'food_number': food_number,
+            'calls': calls,
+            'seconds': seconds,
+            'calls_per_sec': calls / seconds,
+            'peak_memory_mb': peak_memory / 2**20}
+
+
+def result_key(result):
+    """Identifies a benchmark case independently of its measurements
+    """
+    parameters = ('benchmark', 'pop_size', 'food_number', 'food_regen',
+                  'populations', 'rows')
+    return tuple(result.get(name) for name in parameters)
+
+
+def compare(results, baseline_results):
+    """Prints the speed ratio of each case against a baseline run
+    """
+    baseline = {result_key(result): result for result in baseline_results}
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None:
+            continue
+        ratio = old['seconds'] / result['seconds']
+        print("%-60s %6.2fx" % (result_key(result), ratio))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pop-sizes', type=int, nargs='+',
+                        default=[10, 100, 1000, 10000, 100000])
+    parser.add_argument('--food-numbers', type=int, nargs='+',
+                        default=[100, 1000])
+    parser.add_argument('--food-regens', type=float, nargs='+',
+                        default=[5])
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--populations', type=int, default=4,
+                        help="object-oriented populations run together")
+    parser.add_argument('--object-pop-sizes', type=int, nargs='+',
+                        default=[10, 100, 1000])
+    parser.add_argument('--update-pop-sizes', type=int, nargs='+',
+                        default=[100, 1000, 10000],
+                        help="individuals stepped by update_position alone")
+    parser.add_argument('--update-steps', type=int, default=10)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help="skip the traced runs measuring peak memory")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="earlier results to compare with")
+    args = parser.parse_args()
+
+    results = []
+    for pop_size, food_number, food_regen in itertools.product(
+            args.pop_sizes, args.food_numbers, args.food_regens):
+        result = benchmark_simulation(pop_size, food_number, food_regen,
+                                      args.frames, args.seed, args.memory)
+        print("pop %(pop_size)6d  food %(food_number)5d  regen "
+              "%(food_regen)4g: %(frames_per_sec)9.1f frames/s "
+              "%(steps_per_sec)12.0f steps/s %(peak_memory_mb)8.1f MB"
+              % result)
+        results.append(result)
+
+    for pop_size, food_number, food_regen in itertools.product(
+            args.object_pop_sizes, args.food_numbers, args.food_regens):
+        result = benchmark_object_populations(
+            pop_size, food_number, food_regen, args.frames, args.populations,
+            args.seed, args.memory)
+        print("%(populations)d object pops of %(pop_size)6d  food "
+              "%(food_number)5d  regen %(food_regen)4g: %(frames_per_sec)9.1f "
+              "frames/s %(steps_per_sec)12.0f steps/s "
+              "%(peak_memory_mb)8.1f MB" % result)
+        results.append(result)
+
+    for pop_size, food_number in itertools.product(args.update_pop_sizes,
+                                                   args.food_numbers):
+        result = benchmark_update_position(pop_size, food_number,
+                                           args.update_steps, args.seed,
+                                           args.memory)
+        print("update_position pop %(pop_size)6d  food %(food_number)5d: "
+              "%(calls_per_sec)9.0f calls/s %(peak_memory_mb)8.1f MB"
+              % result)
+        results.append(result)
+
+    result = benchmark_add_individual_to_data(args.rows, args.seed,
+                                              args.memory)
+    print("add_individual_to_data: %(rows_per_sec)9.0f rows/s "
+          "%(peak_memory_mb)8.1f MB" % result)
+    results.append(result)
+
+    with open(args.output, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
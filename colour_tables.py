@@ -0,0 +1,44 @@
+"""Precomputed colour lookup tables.
+
+Colours are picked by indexing uint8 tables that are built once, rather than
+building a ramp or calling a colormap for each individual every frame.
+"""
+import functools
+
+import numpy as np
+
+fade_frames = 5000
+
+# Red channel of the blue to purple fade over the last fade_frames of life
+red_fade = np.rint(np.linspace(255, 0, fade_frames)).astype(np.uint8)
+
+
+def life_colours(life_remaining):
+    """RGB colours of individuals from the frames they have left to live,
+    which are zero or negative while they are dying
+    """
+    life_remaining = np.asarray(life_remaining, dtype=np.int64)
+    colours = np.zeros((len(life_remaining), 3), dtype=np.uint8)
+    colours[:, 2] = 255
+    fading = (life_remaining > 0) & (life_remaining < fade_frames)
+    colours[fading, 0] = red_fade[life_remaining[fading]]
+    colours[life_remaining <= 0] = (255, 0, 0)
+    return colours
+
+
+@functools.lru_cache()
+def colormap_lut(name, size=256):
+    """A matplotlib colormap sampled to a size by 4 table of uint8 RGBA
+    """
+    import matplotlib
+
+    colormap = matplotlib.colormaps[name].resampled(size)
+    return np.rint(colormap(np.arange(size)) * 255).astype(np.uint8)
+
+
+def lut_indices(values, vmin, vmax, size=256):
+    """Indices into a table of size entries for values scaled between vmin
+    and vmax, clipped at both ends
+    """
+    scaled = (np.asarray(values, dtype=float) - vmin) / (vmax - vmin)
+    return np.clip(np.floor(scaled * size), 0, size - 1).astype(np.int64)
@@ -0,0 +1,204 @@
+"""Streaming statistics of how well each combination of genes does.
+
+Every death is binned by velocity, size and sense region radius, adding
+its lifetime, food eaten and replications to the sums kept for its bin, and
+is folded into running means and co-moments of the genes and outcomes with
+Welford's update. Both take O(1) work per death and can be read at any
+point of a run, so selection pressure can be analysed on runs too large to
+keep a row for every individual that has lived. Batches of deaths, and the
+statistics of separate runs or tiles, are combined with the pairwise form
+of the same update.
+"""
+import numpy as np
+import pandas as pd
+
+# Names shared with the columns of past_individual_data
+gene_columns = ('Velocity', 'Size', 'Sense')
+outcome_columns = ('Time Lived', 'Food Eaten', 'Replications')
+
+# Standard deviation of the mutation of each gene at birth
+mutation_scales = (1 / 3, 10 / 3, 100 / 3)
+
+
+def gene_ranges(velocity, size, sense_region_radius, spread=8):
+    """Ranges reaching spread mutations either side of the initial genes,
+    starting no lower than zero
+    """
+    return tuple((max(gene - spread * scale, 0), gene + spread * scale)
+                 for gene, scale in zip(
+                     (velocity, size, sense_region_radius), mutation_scales))
+
+
+def merged_stats(stats):
+    """New statistics merging those of several runs or tiles, all binned
+    the same way
+    """
+    merged = gene_fitness_stats.from_state(stats[0].state())
+    for other in stats[1:]:
+        merged.merge(other)
+    return merged
+
+
+class gene_fitness_stats:
+    def __init__(self, velocity_range=(0, 40), size_range=(0, 80),
+                 sense_range=(0, 400), bins=16):
+        """Each gene is split into bins equal bins over its range, with
+        values outside the range counted in the end bins
+        """
+        self.edges = [np.linspace(low, high, bins + 1) for low, high in
+                      (velocity_range, size_range, sense_range)]
+        shape = (bins, bins, bins)
+        self.counts = np.zeros(shape, dtype=np.int64)
+        self.sums = np.zeros((len(outcome_columns),) + shape)
+        self.sums_sq = np.zeros((len(outcome_columns),) + shape)
+
+        # Running mean and co-moments of the genes followed by the outcomes
+        self.count = 0
+        self.mean = np.zeros(len(gene_columns) + len(outcome_columns))
+        self.comoment = np.zeros((len(self.mean), len(self.mean)))
+
+    def __len__(self):
+        return self.count
+
+    def bin_index(self, velocity, size, sense_region_radius):
+        """Flat index of the bin each individual's genes fall in
+        """
+        indices = []
+        for edges, genes in zip(self.edges,
+                                (velocity, size, sense_region_radius)):
+            indices.append(np.clip(np.searchsorted(edges, genes, 'right') - 1,
+                                   0, len(edges) - 2))
+        return np.ravel_multi_index(indices, self.counts.shape)
+
+    def add(self, velocity, size, sense_region_radius, time_lived,
+            foods_eaten, replications):
+        """Folds in the deaths of one or more individuals, given as scalars
+        or equal length arrays
+        """
+        values = np.column_stack([np.atleast_1d(np.asarray(
+            column, dtype=float)) for column in (
+                velocity, size, sense_region_radius, time_lived,
+                foods_eaten, replications)])
+        number = len(values)
+        if not number:
+            return
+
+        # Histograms
+        flat = self.bin_index(values[:, 0], values[:, 1], values[:, 2])
+        np.add.at(self.counts.reshape(-1), flat, 1)
+        for outcome in range(len(outcome_columns)):
+            outcomes = values[:, len(gene_columns) + outcome]
+            np.add.at(self.sums[outcome].reshape(-1), flat, outcomes)
+            np.add.at(self.sums_sq[outcome].reshape(-1), flat, outcomes**2)
+
+        # Running moments
+        batch_mean = values.mean(axis=0)
+        centred = values - batch_mean
+        self.combine(number, batch_mean, centred.T @ centred)
+
+    def combine(self, number, mean, comoment):
+        """Merges the moments of number more values into the running ones
+        """
+        total = self.count + number
+        delta = mean - self.mean
+        self.comoment += comoment + np.outer(delta, delta) * (
+            self.count * number / total)
+        self.mean += delta * number / total
+        self.count = total
+
+    def merge(self, other):
+        """Adds in the statistics of another run or tile binned the same way
+        """
+        if not all(np.array_equal(mine, theirs) for mine, theirs in
+                   zip(self.edges, other.edges)):
+            raise ValueError("Statistics are binned differently")
+        self.counts += other.counts
+        self.sums += other.sums
+        self.sums_sq += other.sums_sq
+        if other.count:
+            self.combine(other.count, other.mean, other.comoment)
+
+    @property
+    def names(self):
+        return gene_columns + outcome_columns
+
+    def covariance(self):
+        """Sample covariance of the genes and outcomes over every death
+        """
+        return pd.DataFrame(self.comoment / max(self.count - 1, 1),
+                            index=self.names, columns=self.names)
+
+    def summary(self):
+        """Count, mean and standard deviation of each gene and outcome
+        """
+        variance = np.diag(self.comoment) / max(self.count - 1, 1)
+        return pd.DataFrame({'count': self.count, 'mean': self.mean,
+                             'std': np.sqrt(variance)}, index=self.names)
+
+    def selection_differentials(self, fitness='Replications'):
+        """Covariance of each gene with fitness over mean fitness, the
+        shift selection makes to the mean of the gene in a generation
+        """
+        outcome = self.names.index(fitness)
+        covariance = self.comoment[:len(gene_columns), outcome] / max(
+            self.count - 1, 1)
+        mean_fitness = self.mean[outcome]
+        return pd.Series(covariance / mean_fitness if mean_fitness else
+                         np.full(len(gene_columns), np.nan),
+                         index=gene_columns)
+
+    def bin_table(self):
+        """Count and the mean and standard deviation of each outcome for
+        every occupied bin, labelled by the centres of its gene ranges
+        """
+        occupied = np.flatnonzero(self.counts)
+        indices = np.unravel_index(occupied, self.counts.shape)
+        counts = self.counts.reshape(-1)[occupied]
+        table = {}
+        for name, edges, index in zip(gene_columns, self.edges, indices):
+            table[name] = (edges[index] + edges[index + 1]) / 2
+        table['count'] = counts
+        for outcome, name in enumerate(outcome_columns):
+            sums = self.sums[outcome].reshape(-1)[occupied]
+            sums_sq = self.sums_sq[outcome].reshape(-1)[occupied]
+            mean = sums / counts
+            table['%s mean' % name] = mean
+            table['%s std' % name] = np.sqrt(np.maximum(
+                sums_sq / counts - mean**2, 0))
+        return pd.DataFrame(table)
+
+    def marginal(self, gene):
+        """Count and mean outcomes for each bin of one gene, over all values
+        of the other two
+        """
+        axis = gene_columns.index(gene)
+        others = tuple(other for other in range(len(gene_columns))
+                       if other != axis)
+        counts = self.counts.sum(axis=others)
+        edges = self.edges[axis]
+        table = {gene: (edges[:-1] + edges[1:]) / 2, 'count': counts}
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for outcome, name in enumerate(outcome_columns):
+                table['%s mean' % name] = self.sums[outcome].sum(
+                    axis=others) / counts
+        return pd.DataFrame(table)
+
+    def state(self):
+        """The statistics as a dict of arrays, for saving in snapshots
+        """
+        return {'edges': np.array(self.edges), 'counts': self.counts,
+                'sums': self.sums, 'sums_sq': self.sums_sq,
+                'count': np.asarray(self.count), 'mean': self.mean,
+                'comoment': self.comoment}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls.__new__(cls)
+        stats.edges = list(np.array(state['edges']))
+        stats.counts = np.array(state['counts'])
+        stats.sums = np.array(state['sums'])
+        stats.sums_sq = np.array(state['sums_sq'])
+        stats.count = int(state['count'])
+        stats.mean = np.array(state['mean'])
+        stats.comoment = np.array(state['comoment'])
+        return stats
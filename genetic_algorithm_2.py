@@ -1,17 +1,21 @@
 import numpy as np
-import pygame
+import heapq
 import math
 import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from mpl_toolkits.mplot3d import Axes3D
-import matplotlib
-import seaborn as sns
-
-sns.set(style="whitegrid")
-sns.set_context("paper")
-
-%matplotlib qt
+from concurrent.futures import ThreadPoolExecutor
+
+from colour_tables import life_colours
+from fitness_stats import gene_fitness_stats, gene_ranges
+from lineage import lineage_store
+from live_plot import live_gene_plot, set_plot_style
+from profiling import phase_timer
+from random_blocks import random_blocks
+from renderer import pygame_renderer
+from record_store import individual_columns, macro_columns, record_store
+from scheduler import event_queue
+from spatial_index import food_grid
+from telemetry import gene_summary
+from vectorised_population import get_energy_use, get_lifetime
 
 
 def is_item_in_sense_region(x_pos, y_pos, item_x_pos, item_y_pos, radius):
@@ -23,128 +27,154 @@ def is_item_in_sense_region(x_pos, y_pos, item_x_pos, item_y_pos, radius):
         return False
 
 
-def get_lifetime(energy_use):
-    """Calculates the lifetime of an individual based on its energy use
-    """
-    constant = 67.5E6
-    lifetime = int(round(constant / energy_use))
-    return lifetime
-
-
-def get_energy_use(ind):
-    """Calculates the energy use of an individual based on chromosome
+class individual:
+    """An individual whose attributes are held in slots rather than a dict.
+    Once dead, the object is kept by its population and given a new life
+    with reset() at a later birth instead of being freed
     """
-    energy_use = 0.5 * ind.size**3 * ind.velocity**2
-    return energy_use
+    __slots__ = ('pop', 'current_theta', 'velocity', 'size',
+                 'sense_region_radius', 'id', 'init_lifetime', 'x_pos',
+                 'y_pos', 'birth_frame', 'alive', 'moving', 'foods_eaten',
+                 'replications', 'life_remaining', 'pool_index')
 
+    # Frames spent dying, red and still, before death
+    dying_time = 200
 
-class individual:
-    def __init__(self, velocity, size, sense_region_radius, pop, name):
+    def __init__(self, velocity, size, sense_region_radius, pop,
+                 parent_id=-1):
+        self.pop = pop
+        self.reset(velocity, size, sense_region_radius, parent_id)
 
+    def reset(self, velocity, size, sense_region_radius, parent_id=-1):
+        """Starts a new life with the given genes, born this frame
+        """
         # World
-        self.pop = pop
-        self.current_theta = np.random.uniform(0, 2 * np.pi)
-        self.x_max = pop.win_x
-        self.y_max = pop.win_y
-        self.x_min = 0
-        self.y_min = 0
-        self.food_x_pos = [f.x_pos for f in pop.foods]
-        self.food_y_pos = [f.y_pos for f in pop.foods]
+        pop = self.pop
+        self.current_theta = pop.rng.uniform('heading', 0, 2 * np.pi)
 
         # Genetic Parameters
         self.velocity = velocity
         self.size = size
         self.sense_region_radius = sense_region_radius
-        self.energy_use = get_energy_use(self)
-        self.chromosome = [self.velocity, self.size, self.sense_region_radius]
 
         # Non-genetic Descriptors
-        self.name = name
-        self.init_lifetime = get_lifetime(self.energy_use)
-        self.x_pos = np.random.uniform(0, pop.win_x)
-        self.y_pos = np.random.uniform(0, pop.win_y)
-        self.x_size = size
-        self.y_size = size
-        self.dying_time = 200
-        self.colour = (0, 0, 255)
-
-        # Ongoing performance
-        self.time_lived = 0
+        if pop.lineage is not None:
+            self.id = int(pop.lineage.add_births(
+                [parent_id], pop.frame_no, [velocity], [size],
+                [sense_region_radius])[0])
+        else:
+            self.id = pop.next_id
+        pop.next_id += 1
+        self.init_lifetime = int(get_lifetime(self.energy_use))
+        self.x_pos = pop.rng.uniform('position', 0, pop.win_x)
+        self.y_pos = pop.rng.uniform('position', 0, pop.win_y)
+
+        # Ongoing performance, with the time lived counted from the frame
+        # before the individual's first step
+        self.birth_frame = pop.frame_no
         self.alive = True
+        self.moving = True
         self.foods_eaten = 0
         self.replications = 0
         self.life_remaining = self.init_lifetime
 
-        # print("%s created" % self.name)
+    @property
+    def energy_use(self):
+        return get_energy_use(self.size, self.velocity)
+
+    @property
+    def chromosome(self):
+        return [self.velocity, self.size, self.sense_region_radius]
+
+    @property
+    def name(self):
+        return "I %s" % self.id
+
+    @property
+    def x_size(self):
+        return self.size
+
+    @property
+    def y_size(self):
+        return self.size
 
-        # Plot traits for population tracking
-        # Set up colour map
-        norm = matplotlib.colors.Normalize(
-            vmin=0.0001, vmax=2 * pop.init_velocity * pop.speed_up)
-        # Create colourmap
-        mapper = plt.cm.ScalarMappable(cmap='gnuplot', norm=norm)
-        pop.live_ax.scatter(self.velocity, self.size, self.sense_region_radius,
-                            color=mapper.to_rgba(self.velocity))
-        pop.live_fig.canvas.draw()
+    @property
+    def time_lived(self):
+        return min(self.pop.frame_no, self.death_frame) - self.birth_frame
 
-    def __del__(self):
-        pop.add_individual_to_data(self)
-        # print("%s died" % self.name)
+    @property
+    def dying_frame(self):
+        """Frame from which the individual stops moving and turns red
+        """
+        return self.birth_frame + self.life_remaining
+
+    @property
+    def death_frame(self):
+        return self.dying_frame + self.dying_time + 1
 
     def update_position(self):
         """Steps the individual in a somewhat random direction
         """
-        # Move towards food if within sense region
+        # Move towards the nearest food within the sense region, only
+        # checking the food in grid cells the sense region overlaps
         move_randomly = True
-        for food_piece in pop.foods:
-            food_in_sense_region = is_item_in_sense_region(
-                self.x_pos, self.y_pos,
-                food_piece.x_pos, food_piece.y_pos,
-                self.sense_region_radius)
-            if food_in_sense_region:
-                move_randomly = False
-                # Calculate distance to food
-                radians_to_food = math.atan2(self.y_pos - food_piece.y_pos,
-                                             self.x_pos - food_piece.x_pos)
-                distance_to_food = math.hypot(self.x_pos - food_piece.x_pos,
-                                              self.y_pos - food_piece.y_pos)
-                distance_to_food = int(distance_to_food)
-
-                # Eata the food once upon it
-                if distance_to_food == 0 and not food_piece.eaten:
-                    food_piece.eat()
-                    self.foods_eaten += 1
-                    self.life_remaining += food_piece.extra_life_time
-
-                # Otherwise move directly towards food
+        food_piece = self.pop.food_grid.nearest_item(
+            self.x_pos, self.y_pos, self.sense_region_radius)
+        if food_piece is not None:
+            move_randomly = False
+            # Calculate distance to food
+            radians_to_food = math.atan2(self.y_pos - food_piece.y_pos,
+                                         self.x_pos - food_piece.x_pos)
+            distance_to_food = math.hypot(self.x_pos - food_piece.x_pos,
+                                          self.y_pos - food_piece.y_pos)
+            distance_to_food = int(distance_to_food)
+
+            # Eata the food once upon it
+            if distance_to_food == 0 and not food_piece.eaten:
+                timer = self.pop.profiler
+                timer.lap('movement')
+                food_piece.eat()
+                self.foods_eaten += 1
+                self.life_remaining += food_piece.extra_life_time
+                self.pop.schedule(self)
+                timer.lap('eating')
+
+                # Replicate individual for every two foods it eats
+                if self.foods_eaten % 2 == 0:
+                    self.replicate()
+                    self.replications += 1
+                    timer.lap('replication')
+
+            # Otherwise move directly towards food
+            else:
+                if distance_to_food > self.velocity:
+                    x_update = -math.cos(radians_to_food) * \
+                        self.velocity
+                    y_update = -math.sin(radians_to_food) * \
+                        self.velocity
                 else:
-                    if distance_to_food > self.velocity:
-                        x_update = -math.cos(radians_to_food) * \
-                            self.velocity
-                        y_update = -math.sin(radians_to_food) * \
-                            self.velocity
-                    else:
-                        x_update = -math.cos(radians_to_food) * \
-                            distance_to_food
-                        y_update = -math.sin(radians_to_food) * \
-                            distance_to_food
-
-                    self.x_pos += x_update
-                    self.y_pos += y_update
-
-                break
+                    x_update = -math.cos(radians_to_food) * \
+                        distance_to_food
+                    y_update = -math.sin(radians_to_food) * \
+                        distance_to_food
+
+                self.x_pos += x_update
+                self.y_pos += y_update
 
         if move_randomly:
-            self.current_theta = np.random.uniform(
-                self.current_theta - np.pi / 4, self.current_theta + np.pi / 4)
+            self.current_theta = self.pop.rng.uniform(
+                'heading', self.current_theta - np.pi / 4,
+                self.current_theta + np.pi / 4)
             x = np.sin(self.current_theta)
             y = np.cos(self.current_theta)
             x_update, y_update = np.multiply((x, y), self.velocity)
 
             # Stop individual going off screen by reversing direction
-            if self.x_pos + x_update >= self.x_max or self.x_pos + x_update < self.x_min:
+            if (self.x_pos + x_update >= self.pop.win_x or
+                    self.x_pos + x_update < 0):
                 x_update *= -1
-            if self.y_pos + y_update >= self.y_max or self.y_pos + y_update < self.y_min:
+            if (self.y_pos + y_update >= self.pop.win_y or
+                    self.y_pos + y_update < 0):
                 y_update *= -1
 
             self.x_pos += x_update
@@ -153,252 +183,465 @@ class individual:
     def replicate(self):
         """Replicates the current individual with mutations from parent
         """
-        mutated_velocity = np.random.normal(self.velocity, 1 / 3)
-        mutated_size = np.random.normal(self.size, 10 / 3)
-        mutated_sense_region_radius = np.random.normal(
-            self.sense_region_radius, 100 / 3)
-        new_ind = individual(mutated_velocity, mutated_size,
-                             mutated_sense_region_radius,
-                             self.pop, "%s copy" % self.name)
+        mutated_velocity = self.pop.rng.normal(
+            'mutation', self.velocity, 1 / 3)
+        mutated_size = self.pop.rng.normal('mutation', self.size, 10 / 3)
+        mutated_sense_region_radius = self.pop.rng.normal(
+            'mutation', self.sense_region_radius, 100 / 3)
+        new_ind = self.pop.new_individual(mutated_velocity, mutated_size,
+                                          mutated_sense_region_radius,
+                                          self.id)
         new_ind.x_pos = self.x_pos
         new_ind.y_pos = self.y_pos
-        pop.individuals.append(new_ind)
-        pop.pop_size += 1
+
+        # Newborns take their first step in the frame they are born
+        new_ind.birth_frame -= 1
+        self.pop.add_individual(new_ind)
+        self.pop.pop_size += 1
 
     def step(self):
-        """Updates the properties of the individual for a step
+        """Moves the individual for a step. Dying and death happen as
+        scheduled events rather than being checked every step, while eating
+        and replication are timed apart from movement as they happen
         """
-        self.time_lived += 1
-        if self.time_lived < self.life_remaining:
-            # Keep moving while alive
-            self.update_position()
-
-            # Replicate individual for every two foods it eats
-            if self.foods_eaten % 2 == 0 and self.foods_eaten / 2 != self.replications:
-                self.replicate()
-                self.replications += 1
-
-            # Colour change
-            red_colour = np.linspace(255, 0, 5000)
-            life_remaining = self.life_remaining - self.time_lived
-            if life_remaining < 5000:
-                self.colour = (red_colour[life_remaining], 0, 255)
-            else:
-                self.colour = (0, 0, 255)
-
-        elif self.time_lived <= self.life_remaining + self.dying_time:
-            # If dying change colour to red
-            self.colour = (255, 0, 0)
-        else:
-            self.alive = False
+        self.update_position()
+        self.pop.profiler.lap('movement')
 
 
 class food:
+    """A piece of food held in slots. Eaten food is kept by its population
+    and placed again with place() when food regenerates
+    """
+    __slots__ = ('pop', 'x_pos', 'y_pos', 'eaten', 'pool_index')
+
+    extra_life_time = 2000
+    colour = (0, 255, 0)
+    x_size = 10
+    y_size = 10
+
     def __init__(self, pop):
-        self.extra_life_time = 2000
-        self.colour = (0, 255, 0)
-        self.x_size = 10
-        self.y_size = 10
-        self.x_pos = np.random.uniform(0, pop.win_x)
-        self.y_pos = np.random.uniform(0, pop.win_y)
+        self.pop = pop
+        self.place()
+
+    def place(self):
+        """Puts the food somewhere new in the world, uneaten
+        """
+        self.x_pos = self.pop.rng.uniform('position', 0, self.pop.win_x)
+        self.y_pos = self.pop.rng.uniform('position', 0, self.pop.win_y)
         self.eaten = False
 
     def eat(self):
         self.eaten = True
+        if self.pop.recorder is not None:
+            self.pop.recorder.food_eaten(self.x_pos, self.y_pos)
+        self.pop.food_grid.remove(self)
+        self.pop.foods.remove(self)
+        self.pop.spare_food.append(self)
+        self.pop.food_number -= 1
+
+
+class entity_pool:
+    """Holds the uneaten food or the living individuals. Entities are
+    removed in O(1) by moving the last one into their slot, so nothing eaten
+    or dead is left to be scanned. Entities added while iterating are
+    included in the iteration
+    """
+    def __init__(self):
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, entity):
+        entity.pool_index = len(self.items)
+        self.items.append(entity)
+
+    def remove(self, entity):
+        last = self.items.pop()
+        if last is not entity:
+            self.items[entity.pool_index] = last
+            last.pool_index = entity.pool_index
 
 
 class population:
-    def __init__(self, pop_size, food_number, food_regen):
+    def __init__(self, pop_size, food_number, food_regen, seed=None,
+                 lineage=None, keep_individual_data=True,
+                 fitness_ranges=None, fitness_bins=16):
+        """Given lineage, every birth is recorded in a lineage_store, kept
+        at lineage if it is a path or in a temporary file if it is True.
+        Deaths are always summarised in fitness_stats, while a row for every
+        individual is only kept in past_individual_data with
+        keep_individual_data. fitness_stats bins each gene into fitness_bins bins over its range
+        in fitness_ranges, by default a range around the genes the first
+        individuals start with
+        """
         self.pop_size = pop_size
         self.win_x = 800
         self.win_y = 800
         self.food_number = food_number
         self.food_regen = food_regen
-        self.individuals = []
-        self.foods = []
+        self.rng = random_blocks(seed)
+        self.profiler = phase_timer(enabled=False)
+        self.individuals = entity_pool()
+        self.foods = entity_pool()
+
+        # Objects of the dead and eaten, reused for births and regrowth
+        self.spare_individuals = []
+        self.spare_food = []
+        self.events = event_queue()
+        self.frame_no = 0
+        self.food_grid = food_grid(self.win_x, self.win_y)
         self.speed_up = 1
         self.init_velocity = 1
-        self.macro_pop_data = pd.DataFrame()
-        self.frame_data = []
-        self.pop_size_data = []
-        self.food_number_data = []
+        self.macro_store = record_store(macro_columns)
         self.individual_data = pd.DataFrame()
         self.dead_individuals = 0
-        self.past_individual_data = pd.DataFrame()
-        column_titles = ['Individual', 'Alive at End', 'Time Lived',
-                         'Food Eaten', 'Replications', 'Size', 'Velocity', 'Sense']
-        self.past_individual_data = self.past_individual_data.reindex(
-            columns=column_titles)
+        self.past_individual_store = record_store(individual_columns)
+        self.keep_individual_data = keep_individual_data
+        self.fitness_ranges = fitness_ranges
+        self.fitness_bins = fitness_bins
+        self.fitness_stats = self.new_fitness_stats()
+        self.next_id = 1
+        self.lineage = None
+        if lineage:
+            self.lineage = lineage_store(
+                None if lineage is True else lineage, first_id=self.next_id)
         self.colour_for_plots = (0, 0, 0, 0)
+        self.live_plot = None
+        self.recorder = None
+
+    def new_fitness_stats(self):
+        """Empty fitness statistics binned over fitness_ranges, or around
+        the initial genes at the current speed up
+        """
+        ranges = self.fitness_ranges
+        if ranges is None:
+            ranges = gene_ranges(self.init_velocity * self.speed_up, 30, 100)
+        return gene_fitness_stats(*ranges, bins=self.fitness_bins)
+
+    def spawn_food(self):
+        """Places a new piece of food in the world, reusing eaten food when
+        there is some
+        """
+        if self.spare_food:
+            new_food = self.spare_food.pop()
+            new_food.place()
+        else:
+            new_food = food(self)
+        self.foods.add(new_food)
+        self.food_grid.add(new_food)
+        if self.recorder is not None:
+            self.recorder.food_added(new_food.x_pos, new_food.y_pos)
+
+    def new_individual(self, velocity, size, sense_region_radius,
+                       parent_id=-1):
+        """An individual born with the given genes, reusing the object of a
+        dead one when there is one
+        """
+        if self.spare_individuals:
+            ind = self.spare_individuals.pop()
+            ind.reset(velocity, size, sense_region_radius, parent_id)
+            return ind
+        return individual(velocity, size, sense_region_radius, self,
+                          parent_id)
+
+    def add_individual(self, ind):
+        """Adds an individual to the living population and schedules it
+        """
+        self.individuals.add(ind)
+        self.schedule(ind)
+        if self.recorder is not None:
+            self.recorder.born(ind.id)
+
+    def migrants(self, number):
+        """Chromosomes of the number fittest moving individuals, judged by
+        food eaten and then time lived, to send to other populations
+        """
+        fittest = heapq.nlargest(
+            number, (ind for ind in self.individuals if ind.moving),
+            key=lambda ind: (ind.foods_eaten, ind.time_lived))
+        return np.array([ind.chromosome for ind in fittest],
+                        dtype=float).reshape(-1, 3)
+
+    def add_migrants(self, chromosomes):
+        """Founds an individual at a random position for each chromosome
+        arriving from another population
+        """
+        for velocity, size, sense_region_radius in chromosomes:
+            self.add_individual(self.new_individual(
+                velocity, size, sense_region_radius))
+            self.pop_size += 1
+
+    def schedule(self, ind):
+        """Queues the frame an individual starts dying. Called again
+        whenever eating extends its life, superseding the earlier entry
+        """
+        self.events.push(ind.dying_frame, 'dying', ind)
+
+    def process_events(self):
+        """Stops individuals that have started dying and removes those that
+        have died, touching only the events due this frame
+        """
+        for frame, kind, ind in self.events.pop_due(self.frame_no):
+            if kind == 'dying':
+                # Skip entries superseded by eating
+                if frame == ind.dying_frame:
+                    ind.moving = False
+                    self.events.push(ind.death_frame, 'death', ind)
+            else:
+                ind.alive = False
+                self.individuals.remove(ind)
+                if self.recorder is not None:
+                    self.recorder.died(ind.id)
+                self.add_individual_to_data(ind)
+                self.spare_individuals.append(ind)
+                self.dead_individuals += 1
+                self.pop_size -= 1
 
     def add_individual_to_data(self, ind):
         """Once an individual dies, add its genes and performance to dataframe
         """
-        new_row = {'Individual': ind.name,
-                   'Alive at End': ind.alive,
-                   'Time Lived': ind.time_lived,
-                   'Food Eaten': ind.foods_eaten,
-                   'Replications': ind.replications,
-                   'Size': ind.size, 'Velocity': ind.velocity,
-                   'Sense': ind.sense_region_radius}
-        self.past_individual_data = self.past_individual_data.append(
-            new_row, ignore_index=True)
-
-    def replot(self):
-        """Replots the live 3D plot of genes after an individual dies
+        if not ind.alive:
+            self.fitness_stats.add(ind.velocity, ind.size,
+                                   ind.sense_region_radius, ind.time_lived,
+                                   ind.foods_eaten, ind.replications)
+        if self.keep_individual_data:
+            new_row = {'Individual': ind.name,
+                       'Alive at End': ind.alive,
+                       'Time Lived': ind.time_lived,
+                       'Food Eaten': ind.foods_eaten,
+                       'Replications': ind.replications,
+                       'Size': ind.size, 'Velocity': ind.velocity,
+                       'Sense': ind.sense_region_radius}
+            self.past_individual_store.append(new_row)
+        if self.lineage is not None:
+            self.lineage.record_outcomes(
+                [ind.id], ind.foods_eaten, ind.replications,
+                -1 if ind.alive else self.frame_no)
+
+    @property
+    def past_individual_data(self):
+        """Genes and performance of every individual that has lived
         """
-        pop.live_ax.clear()
+        return self.past_individual_store.to_dataframe()
 
-        # Set up colour map
-        norm = matplotlib.colors.Normalize(
-            vmin=0.0001, vmax=2 * self.init_velocity * self.speed_up)
-        # Create colourmap
-        mapper = plt.cm.ScalarMappable(cmap='gnuplot', norm=norm)
+    @property
+    def macro_pop_data(self):
+        """Population size and food number for each frame so far
+        """
+        return self.macro_store.to_dataframe()
 
-        for ind in self.individuals:
-            pop.live_ax.scatter(ind.velocity, ind.size, ind.sense_region_radius,
-                                color=mapper.to_rgba(ind.velocity))
-        self.live_ax.set_xlabel("Velocity")
-        self.live_ax.set_ylabel("Size")
-        self.live_ax.set_zlabel("Sense Region Radius")
-        pop.live_fig.canvas.draw()
-
-    def simulate(self, graphics=True):
-        """Starts a simulation of the population, opening a pygame window to
-        animate the population evolution
+    def gene_arrays(self):
+        """Velocities, sizes and sense region radii of the living population
         """
+        return ([ind.velocity for ind in self.individuals],
+                [ind.size for ind in self.individuals],
+                [ind.sense_region_radius for ind in self.individuals])
 
-        # Create window
-        pygame.init()
-        pygame.font.init()
-        pop_font = pygame.font.Font('freesansbold.ttf', 32)
-        ind_font = pygame.font.Font('freesansbold.ttf', 25)
-        win = pygame.display.set_mode((self.win_x, self.win_y))
-        pygame.display.set_caption("Genetic Algorithm Animation")
-
-        # Create live plot figure
-        self.live_fig = plt.figure()
-        self.live_ax = Axes3D(self.live_fig)
-        self.live_ax.set_xlabel("Velocity")
-        self.live_ax.set_ylabel("Size")
-        self.live_ax.set_zlabel("Sense Region Radius")
+    def colours(self):
+        """Colours of the living population, fading from blue to purple over
+        the last frames of life and red while dying
+        """
+        return life_colours([ind.life_remaining - ind.time_lived
+                             for ind in self.individuals])
+
+    def view_state(self):
+        """Positions, sizes, colours and genes of the living population and
+        the food positions, as published to a viewer
+        """
+        individuals = self.individuals
+        return {'ids': [ind.id for ind in individuals],
+                'x_pos': [ind.x_pos for ind in individuals],
+                'y_pos': [ind.y_pos for ind in individuals],
+                'size': [ind.x_size for ind in individuals],
+                'colours': self.colours(),
+                'velocity': [ind.velocity for ind in individuals],
+                'sense_region_radius': [ind.sense_region_radius
+                                        for ind in individuals],
+                'food_x_pos': [food_piece.x_pos for food_piece in self.foods],
+                'food_y_pos': [food_piece.y_pos for food_piece in self.foods]}
+
+    def record_state(self, food=True):
+        """Positions, life left and genes of the living population and, with
+        food, the food positions, as logged by a trajectory_recorder
+        """
+        individuals = self.individuals
+        state = {'ids': [ind.id for ind in individuals],
+                 'x_pos': [ind.x_pos for ind in individuals],
+                 'y_pos': [ind.y_pos for ind in individuals],
+                 'life_left': [ind.life_remaining - ind.time_lived
+                               for ind in individuals],
+                 'size': [ind.x_size for ind in individuals],
+                 'velocity': [ind.velocity for ind in individuals],
+                 'sense_region_radius': [ind.sense_region_radius
+                                         for ind in individuals]}
+        if food:
+            state['food_x_pos'] = [food_piece.x_pos
+                                   for food_piece in self.foods]
+            state['food_y_pos'] = [food_piece.y_pos
+                                   for food_piece in self.foods]
+        return state
+
+    def record_frame(self, telemetry):
+        """Summarises the frame, streaming it to the telemetry writer when
+        there is one rather than keeping it in memory
+        """
+        row = {'frame': self.frame_no,
+               'population': self.pop_size,
+               'food_number': self.food_number}
+        if telemetry is None:
+            self.macro_store.append(row)
+        elif telemetry.due(self.frame_no):
+            row.update(gene_summary(*self.gene_arrays()))
+            telemetry.record(row)
+
+    def start(self, graphics=True, headless=False, max_frames=None,
+              telemetry=None, profile=False, render_every=1, recorder=None):
+        """Creates the initial individuals and food and, unless headless,
+        the window and live plot, ready for step_frame to be called
+        """
+        self.profiler = phase_timer(enabled=profile)
+        self.headless = headless
+        self.graphics = graphics and not headless
+        self.max_frames = max_frames
+        self.telemetry = telemetry
+        self.recorder = recorder
+        self.renderer = None
+        if not headless:
+            self.renderer = pygame_renderer(self.win_x, self.win_y,
+                                            render_every)
 
         # If non-graphics option, speed up the interaction
-        if not graphics:
+        if not self.graphics:
             self.speed_up = 10
+        self.fitness_stats = self.new_fitness_stats()
+
+        # Create live plot figure, redrawn at a fixed rate
+        if not headless:
+            self.live_plot = live_gene_plot(
+                self.gene_arrays, 2 * self.init_velocity * self.speed_up)
 
         # Create initial individuals
+        self.frame_no = 0
         for i in range(self.pop_size):
-            ind_temp = individual(self.init_velocity * self.speed_up, 30, 100,
-                                  self, "I %s" % (i + 1))
-            self.individuals.append(ind_temp)
+            ind_temp = self.new_individual(self.init_velocity * self.speed_up,
+                                           30, 100)
+            self.add_individual(ind_temp)
 
         # Create initial food
         for i in range(self.food_number):
-            food_temp = food(self)
-            self.foods.append(food_temp)
+            self.spawn_food()
+        self.profiler.mark()
 
-        # Main loop
+    def step_frame(self):
+        """Advances the simulation by one frame, returning whether it should
+        carry on
+        """
+        timer = self.profiler
+        renderer = self.renderer
         running = True
-        self.frame_no = 0
-        while running:
-            if not graphics:
-                plt.pause(0.000001)
-            self.frame_no += 1
-
-            # Stop the program when window is quit
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-
-            if graphics:
-                win.fill((0, 0, 0))
-
-                # Population text
-                pop_text = pop_font.render("Population: %s" %
-                                           self.pop_size, True, (255, 255, 255))
-                win.blit(pop_text, (20, 20))
-
-            # Food regeneration
-            if self.food_regen:
-                food_regen_wait_time = 1000 / (self.food_regen * self.speed_up)
-                if self.frame_no % food_regen_wait_time == 0:
-                    self.food_number += 1
-                    new_food = food(self)
-                    self.foods.append(new_food)
-
-            # Step and animate each individual
-            temp_individuals = []
-            for ind in self.individuals:
-                # If alive, move
-                if ind.alive:
-                    temp_individuals.append(ind)
-                    ind.step()
-
-                    if graphics:
-                        # Draw individual
-                        pygame.draw.rect(win, ind.colour,
-                                         (int(round(ind.x_pos)), int(round(ind.y_pos)),
-                                          int(round(ind.x_size)), int(round(ind.y_size))))
-                        # Label individual
-                        ind_text = ind_font.render(
-                            ind.name, True, (255, 255, 255))
-                        win.blit(ind_text, (int(round(ind.x_pos)),
-                                            int(round(ind.y_pos))))
-
-                # If dead remove from population
-                else:
-                    self.dead_individuals += 1
-                    del ind
-                    self.replot()
-                    self.pop_size -= 1
-
-            self.individuals = temp_individuals
-
-            # Animate foods
-            food_index = 0
-            for food_piece in self.foods:
-                # If not eaten, draw
-                if not food_piece.eaten:
-                    food_index += 1
-
-                    if graphics:
-                        pygame.draw.rect(win, food_piece.colour,
-                                         (int(round(food_piece.x_pos)),
-                                          int(round(food_piece.y_pos)),
-                                          int(round(food_piece.x_size)),
-                                          int(round(food_piece.y_size))))
-
-                # If eaten remove from foods
-                else:
-                    # self.foods = np.delete(self.foods, food_index)
-                    self.foods.pop(food_index)
-                    self.food_number -= 1
-
-            if graphics:
-                pygame.display.update()
-
-            # Summarise each step and save macro population data
-            self.frame_data.append(self.frame_no)
-            self.pop_size_data.append(self.pop_size)
-            self.food_number_data.append(self.food_number)
+        if self.live_plot is not None:
+            self.live_plot.refresh()
+            timer.lap('live plot')
+        self.frame_no += 1
+
+        # Stop the program when window is quit
+        if renderer is not None:
+            running = renderer.handle_events()
+        timer.lap('events')
+
+        # Food regeneration
+        if self.food_regen:
+            food_regen_wait_time = 1000 / (self.food_regen * self.speed_up)
+            if self.frame_no % food_regen_wait_time == 0:
+                self.food_number += 1
+                self.spawn_food()
+        timer.lap('food regeneration')
+
+        # Start dying and remove the dead as their events fall due
+        self.process_events()
+        timer.lap('scheduled events')
+
+        # Step each individual that is not dying
+        for ind in self.individuals:
+            if ind.moving:
+                ind.step()
+
+        # Animate individuals and foods in one batch
+        if self.graphics and renderer.due(self.frame_no):
+            individuals = self.individuals
+            colours = self.colours()
+            timer.lap('colour')
+            renderer.draw(
+                self.pop_size,
+                [ind.x_pos for ind in individuals],
+                [ind.y_pos for ind in individuals],
+                [ind.x_size for ind in individuals],
+                colours,
+                [ind.name for ind in individuals],
+                [food_piece.x_pos for food_piece in self.foods],
+                [food_piece.y_pos for food_piece in self.foods])
+            timer.lap('rendering')
+
+        # Summarise each step and save macro population data
+        self.record_frame(self.telemetry)
+        if (self.recorder is not None and
+                self.recorder.due(self.frame_no)):
+            self.recorder.record(
+                self.frame_no, self.pop_size,
+                self.record_state(self.recorder.starting_chunk))
+        timer.lap('data recording')
+
+        # Finish evolution after an amount of iterations
+        if self.pop_size == 0 or self.frame_no == self.max_frames:
+            running = False
+        return running
+
+    def finish(self):
+        """Records the individuals alive at the end and closes the window
+        """
+        # Document final individuals
+        for ind in self.individuals:
+            self.add_individual_to_data(ind)
 
-            # Finish evolution after an amount of iterations
-            if self.pop_size == 0:
-                running = False
+        if self.telemetry is not None:
+            self.telemetry.flush()
+        if self.recorder is not None:
+            self.recorder.flush()
 
-        # Collect data
-        self.macro_pop_data['frame'] = self.frame_data
-        self.macro_pop_data['population'] = self.pop_size_data
-        self.macro_pop_data['food_number'] = self.food_number_data
+        if self.renderer is not None:
+            self.live_plot.refresh(force=True)
+            self.renderer.close()
 
-        # Document final individuals
-        for ind in self.individuals:
-            pop.add_individual_to_data(ind)
+        if self.profiler.enabled:
+            print(self.profiler.report())
 
-        pygame.quit()
+    def simulate(self, graphics=True, headless=False, max_frames=None,
+                 telemetry=None, profile=False, render_every=1,
+                 recorder=None):
+        """Starts a simulation of the population, opening a pygame window to
+        animate the population evolution. A headless simulation creates no
+        window, fonts or figures and never imports pygame or matplotlib.
+        Only every render_every-th frame is drawn, while the simulation
+        itself steps every frame. Given a telemetry_writer, frame data is
+        streamed to it instead of being kept in macro_pop_data. With
+        profile, each phase of a frame is timed in self.profiler and
+        reported at the end. Given a trajectory_recorder, the frames
+        it is due are logged to it for replay
+        """
+        self.start(graphics, headless, max_frames, telemetry, profile,
+                   render_every, recorder)
+        while self.step_frame():
+            pass
+        self.finish()
 
     def plot_summary(self):
+        import matplotlib.pyplot as plt
+
+        set_plot_style()
         plt.figure()
         plt.xlabel("Frame")
         plt.ylabel("#")
@@ -410,12 +653,34 @@ class population:
         plt.show()
 
 
-pop = population(pop_size=10, food_number=100, food_regen=5)
-pop.simulate(graphics=False)
-pop.plot_summary()
-plt.show()
-
-
-pd.set_option('display.max_rows', None)
-pd.set_option('display.max_columns', None)
-pop.past_individual_data.sort_values(by='Time Lived', ascending=False)
+def run_populations(populations, max_frames=None, threads=None):
+    """Runs several headless populations in this process, either stepping
+    them in turn a frame at a time or, given a number of threads, each on
+    its own thread
+    """
+    if threads:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(
+                lambda pop: pop.simulate(headless=True, max_frames=max_frames),
+                populations))
+        return populations
+
+    for pop in populations:
+        pop.start(headless=True, max_frames=max_frames)
+    running = list(populations)
+    while running:
+        running = [pop for pop in running if pop.step_frame()]
+    for pop in populations:
+        pop.finish()
+    return populations
+
+
+if __name__ == "__main__":
+    pop = population(pop_size=10, food_number=100, food_regen=5)
+    pop.simulate(graphics=False)
+    pop.plot_summary()
+
+    pd.set_option('display.max_rows', None)
+    pd.set_option('display.max_columns', None)
+    print(pop.past_individual_data.sort_values(by='Time Lived',
+                                               ascending=False))
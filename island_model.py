@@ -0,0 +1,197 @@
+"""Several populations evolving as islands in parallel processes.
+
+Each island is a headless population with its own food supply, stepped in
+its own process. Every migration_interval frames the islands write the
+chromosomes of their fittest individuals into a block of shared memory and
+meet at a barrier, after which each founds copies of the other islands'
+migrants among its own population. Migrants travel as plain rows of genes,
+so nothing is pickled between the islands while they run. The buffer has
+two halves used on alternate migrations, so an island can write its next
+migrants while a slower one is still reading the last.
+"""
+from multiprocessing import Barrier, Pipe, Process, shared_memory
+
+import numpy as np
+import pandas as pd
+
+from fitness_stats import merged_stats
+from genetic_algorithm_2 import population
+
+
+class migration_buffer:
+    def __init__(self, n_islands, migrants, name=None):
+        """Creates shared memory for up to migrants chromosomes from each of
+        n_islands islands, or attaches to the existing block called name
+        """
+        self.n_islands = n_islands
+        self.migrants = migrants
+        size = 8 * (2 * n_islands + 2 * n_islands * migrants * 3)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.counts = np.ndarray((2, n_islands), dtype=np.int64,
+                                 buffer=self.memory.buf)
+        self.chromosomes = np.ndarray(
+            (2, n_islands, migrants, 3), dtype=float, buffer=self.memory.buf,
+            offset=8 * 2 * n_islands)
+        if name is None:
+            self.counts[:] = 0
+
+    def write(self, island, migration, chromosomes):
+        """Publishes an island's migrants for a migration
+        """
+        half = migration % 2
+        count = min(len(chromosomes), self.migrants)
+        self.chromosomes[half, island, :count] = chromosomes[:count]
+        self.counts[half, island] = count
+
+    def read(self, island, migration):
+        """Copies out the migrants every other island sent in a migration
+        """
+        half = migration % 2
+        return np.concatenate(
+            [np.empty((0, 3))] +
+            [self.chromosomes[half, other, :self.counts[half, other]]
+             for other in range(self.n_islands) if other != island])
+
+    def release(self, unlink=False):
+        """Detaches from the shared memory, freeing it if unlink
+        """
+        self.counts = None
+        self.chromosomes = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def island_worker(connection, island, island_args, buffer_name, n_islands,
+                  migrants, barrier, max_frames, migration_interval):
+    """Process loop for one island, sending back its records at the end.
+    Islands that die out keep meeting the others so migrants can recolonise
+    them
+    """
+    buffer = migration_buffer(n_islands, migrants, name=buffer_name)
+    try:
+        pop = population(**island_args)
+        pop.start(headless=True, max_frames=max_frames)
+        migration = 0
+        while pop.frame_no < max_frames:
+            pop.step_frame()
+            if (pop.frame_no % migration_interval == 0 and
+                    pop.frame_no < max_frames):
+                buffer.write(island, migration, pop.migrants(migrants))
+                barrier.wait()
+                pop.add_migrants(buffer.read(island, migration))
+                migration += 1
+        pop.finish()
+    except BaseException:
+        # Free the other islands rather than leave them at the barrier
+        barrier.abort()
+        raise
+    finally:
+        buffer.release()
+    individual_store = pop.past_individual_store
+    macro_store = pop.macro_store
+    connection.send((individual_store.records[:len(individual_store)],
+                     macro_store.records[:len(macro_store)],
+                     pop.fitness_stats, pop.pop_size, pop.dead_individuals))
+    connection.close()
+
+
+class island_model:
+    def __init__(self, environments, pop_size=10, seed=None, migrants=5,
+                 migration_interval=500, **kwargs):
+        """One island per (food_number, food_regen) pair in environments,
+        each starting with pop_size individuals. Every migration_interval
+        frames each island sends copies of its migrants fittest
+        individuals to every other island. Extra keyword arguments are
+        passed to each island's population
+        """
+        self.environments = list(environments)
+        self.migrants = migrants
+        self.migration_interval = migration_interval
+        seeds = np.random.SeedSequence(seed).generate_state(
+            len(self.environments))
+        self.island_args = [
+            dict(kwargs, pop_size=pop_size, food_number=food_number,
+                 food_regen=food_regen, seed=int(island_seed))
+            for (food_number, food_regen), island_seed in
+            zip(self.environments, seeds)]
+        self.results = []
+
+    def simulate(self, max_frames):
+        """Runs every island in its own process for max_frames frames
+        """
+        n_islands = len(self.island_args)
+        buffer = migration_buffer(n_islands, self.migrants)
+        barrier = Barrier(n_islands)
+        connections = []
+        workers = []
+        try:
+            for island, island_args in enumerate(self.island_args):
+                parent_end, child_end = Pipe()
+                worker = Process(target=island_worker, args=(
+                    child_end, island, island_args, buffer.name, n_islands,
+                    self.migrants, barrier, max_frames,
+                    self.migration_interval))
+                worker.start()
+                child_end.close()
+                connections.append(parent_end)
+                workers.append(worker)
+            self.results = [connection.recv() for connection in connections]
+        except EOFError:
+            raise RuntimeError("An island process failed") from None
+        finally:
+            for worker in workers:
+                worker.join()
+            buffer.release(unlink=True)
+
+    @property
+    def pop_sizes(self):
+        return [pop_size for _, _, _, pop_size, _ in self.results]
+
+    @property
+    def fitness_stats(self):
+        """Fitness statistics of every island merged together
+        """
+        return merged_stats(self.island_fitness_stats)
+
+    @property
+    def island_fitness_stats(self):
+        return [island_stats for _, _, island_stats, _, _ in self.results]
+
+    def island_frames(self, records):
+        """Stacks each island's records into one frame labelled by island
+        """
+        frames = []
+        for island, island_records in enumerate(records):
+            frame = pd.DataFrame(island_records)
+            frame.insert(0, 'island', island)
+            frames.append(frame)
+        return pd.concat(frames, ignore_index=True)
+
+    @property
+    def past_individual_data(self):
+        """Genes and performance of every individual that has lived on any
+        island, labelled by island
+        """
+        return self.island_frames([records for records, _, _, _, _ in
+                                   self.results])
+
+    @property
+    def macro_pop_data(self):
+        """Population size and food number of each island for each frame
+        """
+        return self.island_frames([records for _, records, _, _, _ in
+                                   self.results])
+
+
+if __name__ == "__main__":
+    model = island_model([(50, 2), (100, 5), (200, 10), (400, 20)],
+                         pop_size=10, seed=0)
+    model.simulate(max_frames=5000)
+    print(model.pop_sizes)
+    print(model.fitness_stats.summary())
+    print(model.fitness_stats.selection_differentials())
@@ -0,0 +1,158 @@
+"""Compiled movement and foraging kernels for the vectorised population.
+
+Nearest food selection, steering towards food, the random walk heading
+update and reflection off the walls are written as plain loops over the
+population and compiled in nopython mode with Numba when it is installed.
+Numba is an optional extra, only imported by compiled_kernels() when the
+compiled backend is asked for; otherwise the engine keeps to its NumPy
+implementation, which serves as the reference the kernels must match.
+Random numbers are drawn by the engine and passed in, so both backends
+consume the generator identically. check_parity() runs the two side by
+side from the same seed.
+"""
+import math
+import sys
+
+import numpy as np
+
+# The compiled kernels, once compiled_kernels() has made them
+compiled = None
+
+
+def nearest_food_kernel(x_pos, y_pos, radius, food_x_pos, food_y_pos,
+                        cell_start, food_order, cell_size, n_x, n_y,
+                        x_min=0.0, y_min=0.0):
+    """Index of the nearest food strictly inside each sense region, ties
+    going to the lowest food index, or -1 where there is none
+    """
+    target = np.full(len(x_pos), -1, dtype=np.int64)
+    for k in range(len(x_pos)):
+        x = x_pos[k]
+        y = y_pos[k]
+        reach = abs(radius[k])
+        radius_sq = radius[k]**2
+        i_min = max(int((x - x_min - reach) // cell_size), 0)
+        i_max = min(int((x - x_min + reach) // cell_size), n_x - 1)
+        j_min = max(int((y - y_min - reach) // cell_size), 0)
+        j_max = min(int((y - y_min + reach) // cell_size), n_y - 1)
+        best_dist_sq = np.inf
+        best = -1
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                cell = i * n_y + j
+                for slot in range(cell_start[cell], cell_start[cell + 1]):
+                    food = food_order[slot]
+                    dist_sq = ((x - food_x_pos[food])**2 +
+                               (y - food_y_pos[food])**2)
+                    if dist_sq >= radius_sq:
+                        continue
+                    if dist_sq < best_dist_sq or (
+                            dist_sq == best_dist_sq and food < best):
+                        best_dist_sq = dist_sq
+                        best = food
+        target[k] = best
+    return target
+
+
+def move_kernel(index, target, turns, x_pos, y_pos, current_theta,
+                velocity, foods_eaten, life_remaining, extra_life_time,
+                food_x_pos, food_y_pos, win_x, win_y):
+    """Moves the individuals in index towards their target food, or on a
+    random walk using one turn each where the target is -1, and eats food
+    they are upon. Returns a mask of the food eaten
+    """
+    eaten = np.zeros(len(food_x_pos), dtype=np.bool_)
+    walker = 0
+    for k in range(len(index)):
+        ind = index[k]
+        food = target[k]
+        if food >= 0:
+            dx = food_x_pos[food] - x_pos[ind]
+            dy = food_y_pos[food] - y_pos[ind]
+            distance = math.hypot(dx, dy)
+            distance_to_food = math.floor(distance)
+
+            # Eat the food once upon it, the first individual to arrive wins
+            if distance_to_food == 0:
+                if not eaten[food]:
+                    eaten[food] = True
+                    foods_eaten[ind] += 1
+                    life_remaining[ind] += extra_life_time
+
+            # Otherwise move directly towards food
+            else:
+                step = min(velocity[ind], distance_to_food)
+                x_pos[ind] += dx / distance * step
+                y_pos[ind] += dy / distance * step
+        else:
+            theta = current_theta[ind] + turns[walker]
+            walker += 1
+            current_theta[ind] = theta
+            x_update = math.sin(theta) * velocity[ind]
+            y_update = math.cos(theta) * velocity[ind]
+
+            # Stop individuals going off screen by reversing direction
+            new_x = x_pos[ind] + x_update
+            new_y = y_pos[ind] + y_update
+            if new_x >= win_x or new_x < 0:
+                x_update = -x_update
+            if new_y >= win_y or new_y < 0:
+                y_update = -y_update
+            x_pos[ind] += x_update
+            y_pos[ind] += y_update
+    return eaten
+
+
+def compiled_kernels():
+    """The nearest food and movement kernels compiled with Numba, importing
+    it on first use. Raises ImportError when Numba is not installed
+    """
+    global compiled
+    if compiled is None:
+        try:
+            import numba
+        except ImportError:
+            raise ImportError(
+                "The numba backend needs numba installed") from None
+        compiled = (numba.njit(cache=True)(nearest_food_kernel),
+                    numba.njit(cache=True)(move_kernel))
+    return compiled
+
+
+def check_parity(pop_size=1000, food_number=1000, food_regen=5, frames=200,
+                 seed=0):
+    """Runs the NumPy and compiled backends side by side from the same seed,
+    returning the first frame their states differ on or None if they stay
+    identical
+    """
+    from vectorised_population import vectorised_population
+
+    reference = vectorised_population(pop_size, food_number, food_regen,
+                                      seed=seed, backend='numpy')
+    candidate = vectorised_population(pop_size, food_number, food_regen,
+                                      seed=seed, backend='numba')
+    for frame in range(frames):
+        if not reference.pop_size:
+            break
+        reference.step()
+        candidate.step()
+        for name in reference.state_fields:
+            if not np.array_equal(getattr(reference, name),
+                                  getattr(candidate, name)):
+                return reference.frame_no
+        if not (np.array_equal(reference.food_x_pos, candidate.food_x_pos)
+                and np.array_equal(reference.food_y_pos,
+                                   candidate.food_y_pos)):
+            return reference.frame_no
+    return None
+
+
+if __name__ == "__main__":
+    differing = 0
+    for pop_size, food_number in ((10, 100), (1000, 1000), (10000, 100)):
+        frame = check_parity(pop_size, food_number, frames=500)
+        differing += frame is not None
+        print("pop %6d food %5d: %s" % (
+            pop_size, food_number,
+            "identical" if frame is None else "differs at frame %d" % frame))
+    sys.exit(1 if differing else 0)
@@ -0,0 +1,202 @@
+"""Memory-mapped genealogy of every individual born in a run.
+
+Each birth appends one fixed-size row holding the individual's integer id,
+its parent's id, its birth frame and genes, and its outcome is filled in
+when it dies. Rows live in a file mapped into memory that grows
+geometrically, so runs with millions of births need neither RAM for every
+row nor name strings that grow with each generation. Because parents are
+always born before their children, ids increase down the file and
+ancestry can be followed with array operations.
+"""
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+lineage_dtype = np.dtype([('id', np.int64), ('parent', np.int64),
+                          ('birth_frame', np.int64),
+                          ('death_frame', np.int64),
+                          ('velocity', float), ('size', float),
+                          ('sense_region_radius', float),
+                          ('foods_eaten', np.int64),
+                          ('replications', np.int64)])
+
+
+class lineage_store:
+    def __init__(self, path=None, first_id=0, capacity=4096):
+        """Rows are written to path, or to an anonymous temporary file when
+        no path is given. Ids are consecutive from first_id, and founders
+        have a parent of -1
+        """
+        self.path = path
+        if path is None:
+            self.file = tempfile.TemporaryFile()
+        else:
+            self.file = open(path, 'w+b')
+        self.first_id = first_id
+        self.length = 0
+        self.table = np.memmap(self.file, dtype=lineage_dtype, mode='r+',
+                               shape=(capacity,))
+        self.cached_children = None
+
+    @classmethod
+    def load(cls, path):
+        """Opens a closed lineage file read-only
+        """
+        store = cls.__new__(cls)
+        store.path = path
+        store.file = None
+        store.table = np.memmap(path, dtype=lineage_dtype, mode='r')
+        store.length = len(store.table)
+        store.first_id = int(store.table['id'][0]) if store.length else 0
+        store.cached_children = None
+        return store
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def records(self):
+        """A view of the filled rows
+        """
+        return self.table[:self.length]
+
+    def rows(self, ids):
+        return np.asarray(ids, dtype=np.int64) - self.first_id
+
+    def reserve(self, extra):
+        """Makes room for extra more rows, doubling the mapped file when full
+        """
+        needed = self.length + extra
+        if needed > len(self.table):
+            capacity = max(needed, 2 * len(self.table))
+            self.table.flush()
+            self.table = np.memmap(self.file, dtype=lineage_dtype,
+                                   mode='r+', shape=(capacity,))
+
+    def add_births(self, parents, birth_frame, velocity, size,
+                   sense_region_radius):
+        """Records newborns with the given parent ids and genes, returning
+        their ids
+        """
+        number = len(velocity)
+        self.reserve(number)
+        ids = np.arange(self.first_id + self.length,
+                        self.first_id + self.length + number)
+        new_rows = self.table[self.length:self.length + number]
+        new_rows['id'] = ids
+        new_rows['parent'] = parents
+        new_rows['birth_frame'] = birth_frame
+        new_rows['death_frame'] = -1
+        new_rows['velocity'] = velocity
+        new_rows['size'] = size
+        new_rows['sense_region_radius'] = sense_region_radius
+        new_rows['foods_eaten'] = 0
+        new_rows['replications'] = 0
+        self.length += number
+        self.cached_children = None
+        return ids
+
+    def record_outcomes(self, ids, foods_eaten, replications, death_frame=-1):
+        """Fills in how individuals fared, with a death frame of -1 for those
+        still alive
+        """
+        rows = self.rows(ids)
+        self.table['foods_eaten'][rows] = foods_eaten
+        self.table['replications'][rows] = replications
+        self.table['death_frame'][rows] = death_frame
+
+    def ancestors(self, id):
+        """Ids of an individual's parent, grandparent and so on back to its
+        founder
+        """
+        parents = self.records['parent']
+        ancestors = []
+        parent = parents[id - self.first_id]
+        while parent >= 0:
+            ancestors.append(parent)
+            parent = parents[parent - self.first_id]
+        return np.array(ancestors, dtype=np.int64)
+
+    def children_index(self):
+        """Rows sorted by parent with the start of each parent's children,
+        cached until more births are added
+        """
+        if self.cached_children is None:
+            parent_rows = self.records['parent'] - self.first_id
+            order = np.argsort(parent_rows, kind='stable')
+            starts = np.searchsorted(parent_rows[order],
+                                     np.arange(self.length + 1))
+            self.cached_children = (order, starts)
+        return self.cached_children
+
+    def descendants(self, id):
+        """Ids of every descendant of an individual, generation by generation
+        """
+        order, starts = self.children_index()
+        frontier = self.rows([id])
+        found = []
+        while len(frontier):
+            counts = starts[frontier + 1] - starts[frontier]
+            offsets = np.arange(counts.sum()) - np.repeat(
+                np.cumsum(counts) - counts, counts)
+            frontier = order[np.repeat(starts[frontier], counts) + offsets]
+            found.append(frontier)
+        return np.concatenate(found) + self.first_id
+
+    def founders_and_generations(self):
+        """Founder id and number of generations from it for every row,
+        found by pointer jumping in O(log depth) array passes
+        """
+        parent_rows = self.records['parent'] - self.first_id
+        is_founder = parent_rows < 0
+        jump = np.where(is_founder, np.arange(self.length), parent_rows)
+        generation = (~is_founder).astype(np.int64)
+        while True:
+            next_jump = jump[jump]
+            if np.array_equal(next_jump, jump):
+                break
+            generation += generation[jump]
+            jump = next_jump
+        return jump + self.first_id, generation
+
+    def lineage_metrics(self, frame=None):
+        """Success of each founder's lineage: its size, depth, survivors,
+        food eaten and frames lived, counting survivors up to frame
+        """
+        records = self.records
+        founders, generation = self.founders_and_generations()
+        alive = records['death_frame'] < 0
+        if frame is None:
+            frame = max(records['birth_frame'].max(initial=0),
+                        records['death_frame'].max(initial=0))
+        frames_lived = np.where(alive, frame, records['death_frame']) - \
+            records['birth_frame']
+
+        founder_ids, lineage = np.unique(founders, return_inverse=True)
+        generations = np.zeros(len(founder_ids), dtype=np.int64)
+        np.maximum.at(generations, lineage, generation)
+        return pd.DataFrame({
+            'founder': founder_ids,
+            'births': np.bincount(lineage, minlength=len(founder_ids)),
+            'generations': generations,
+            'alive': np.bincount(lineage, weights=alive).astype(np.int64),
+            'foods_eaten': np.bincount(
+                lineage, weights=records['foods_eaten']).astype(np.int64),
+            'frames_lived': np.bincount(
+                lineage, weights=frames_lived).astype(np.int64)})
+
+    def to_dataframe(self):
+        return pd.DataFrame(self.records)
+
+    def flush(self):
+        self.table.flush()
+
+    def close(self):
+        """Flushes the rows and trims the file to them so it can be loaded
+        """
+        self.table.flush()
+        del self.table
+        self.file.truncate(self.length * lineage_dtype.itemsize)
+        self.file.close()
+        self.table = None
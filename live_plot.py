@@ -0,0 +1,76 @@
+"""Live 3D plot of the genes of the living population.
+
+One scatter artist is kept for the whole run and its points and colours are
+updated in place at a fixed refresh rate, so the cost of the plot does not
+depend on how many individuals are born or die between refreshes.
+matplotlib and seaborn are only imported once a plot is created.
+"""
+import time
+
+import numpy as np
+
+from colour_tables import colormap_lut, lut_indices
+
+
+def set_plot_style():
+    """Imports seaborn only when a figure is needed and applies its style
+    """
+    import seaborn as sns
+    sns.set(style="whitegrid")
+    sns.set_context("paper")
+
+
+class live_gene_plot:
+    def __init__(self, genes, max_velocity, refresh_interval=0.2):
+        """genes is called at each refresh and returns arrays of the living
+        population's velocities, sizes and sense region radii
+        """
+        import matplotlib.pyplot as plt
+        import mpl_toolkits.mplot3d  # Registers the 3d projection
+
+        set_plot_style()
+        self.genes = genes
+        self.refresh_interval = refresh_interval
+        self.last_refresh = -np.inf
+
+        self.fig = plt.figure()
+        self.ax = self.fig.add_subplot(projection='3d')
+        self.ax.set_xlabel("Velocity")
+        self.ax.set_ylabel("Size")
+        self.ax.set_zlabel("Sense Region Radius")
+        self.scatter = self.ax.scatter([], [], [])
+
+        # Colour by velocity through a precomputed colour map table
+        self.max_velocity = max_velocity
+        self.colour_table = colormap_lut('gnuplot') / 255
+        plt.show(block=False)
+
+    def refresh(self, force=False):
+        """Redraws the plot if the refresh interval has passed since the
+        last redraw, returning whether it did
+        """
+        now = time.monotonic()
+        if not force and now - self.last_refresh < self.refresh_interval:
+            return False
+        self.last_refresh = now
+
+        velocity, size, sense_region_radius = (
+            np.asarray(genes, dtype=float) for genes in self.genes())
+        self.scatter._offsets3d = (velocity, size, sense_region_radius)
+        colours = self.colour_table[lut_indices(velocity, 0.0001,
+                                                self.max_velocity)]
+        self.scatter.set_facecolor(colours)
+        self.scatter.set_edgecolor(colours)
+
+        # Keep every point in view
+        if len(velocity):
+            for set_limits, genes in ((self.ax.set_xlim, velocity),
+                                      (self.ax.set_ylim, size),
+                                      (self.ax.set_zlim, sense_region_radius)):
+                margin = max(0.05 * np.ptp(genes), 1E-3 * abs(genes[0]),
+                             1E-6)
+                set_limits(genes.min() - margin, genes.max() + margin)
+
+        self.fig.canvas.draw_idle()
+        self.fig.canvas.flush_events()
+        return True
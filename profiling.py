@@ -0,0 +1,74 @@
+"""Lightweight per-phase timing of the simulation loop.
+
+A single running clock is kept and each call to lap() charges the time since
+the previous lap to the named phase, so instrumenting a loop costs one clock
+read per phase rather than the per-call overhead of cProfile.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class phase_timer:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.totals = {}
+        self.counts = {}
+
+        # Counts of laps per power-of-two bucket of nanoseconds
+        self.histograms = {}
+        self.last = time.perf_counter_ns()
+
+    def mark(self):
+        """Restarts the clock without charging the time to any phase
+        """
+        if self.enabled:
+            self.last = time.perf_counter_ns()
+
+    def lap(self, phase):
+        """Charges the time since the last lap or mark to phase
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        elapsed = now - self.last
+        self.last = now
+        if phase not in self.totals:
+            self.totals[phase] = 0
+            self.counts[phase] = 0
+            self.histograms[phase] = [0] * 64
+        self.totals[phase] += elapsed
+        self.counts[phase] += 1
+        self.histograms[phase][elapsed.bit_length()] += 1
+
+    def percentile(self, phase, q):
+        """Estimates a percentile of a phase's lap times in seconds from its
+        histogram, using the upper edge of the bucket
+        """
+        counts = np.cumsum(self.histograms[phase])
+        bucket = np.searchsorted(counts, q / 100 * counts[-1])
+        return 2.0**bucket / 1E9
+
+    def summary(self):
+        """Tabulates calls, total and mean time and share of each phase
+        """
+        total = sum(self.totals.values()) or 1
+        rows = []
+        for phase, phase_total in self.totals.items():
+            rows.append({'phase': phase,
+                         'calls': self.counts[phase],
+                         'total (s)': phase_total / 1E9,
+                         'mean (us)': phase_total / self.counts[phase] / 1E3,
+                         'p50 (us)': self.percentile(phase, 50) * 1E6,
+                         'p99 (us)': self.percentile(phase, 99) * 1E6,
+                         'share (%)': 100 * phase_total / total})
+        summary = pd.DataFrame(rows, columns=[
+            'phase', 'calls', 'total (s)', 'mean (us)', 'p50 (us)',
+            'p99 (us)', 'share (%)'])
+        return summary.sort_values('total (s)', ascending=False)
+
+    def report(self):
+        """End of run report of where the time went
+        """
+        return self.summary().to_string(index=False, float_format="%.3f")
@@ -0,0 +1,49 @@
+"""Seedable random numbers handed out from pre-drawn blocks.
+
+Drawing one scalar at a time from NumPy has a large fixed overhead, so
+numbers are drawn a block at a time and handed out individually. Each stream
+(headings, mutations, positions) has its own generator spawned from the
+population's seed, so a run is reproducible for a given seed.
+"""
+import numpy as np
+
+streams = ('heading', 'mutation', 'position')
+
+
+class random_blocks:
+    def __init__(self, seed=None, block_size=4096):
+        self.block_size = block_size
+        children = np.random.SeedSequence(seed).spawn(len(streams))
+        self.generators = {name: np.random.default_rng(child)
+                           for name, child in zip(streams, children)}
+
+        # Blocks of standard draws, keyed by stream and distribution
+        self.blocks = {}
+        self.positions = {}
+
+    def next_draw(self, stream, distribution):
+        """Takes the next standard uniform or normal draw from a block,
+        drawing a new block when the current one runs out
+        """
+        key = (stream, distribution)
+        position = self.positions.get(key, self.block_size)
+        if position == self.block_size:
+            generator = self.generators[stream]
+            if distribution == 'uniform':
+                block = generator.random(self.block_size)
+            else:
+                block = generator.standard_normal(self.block_size)
+            self.blocks[key] = block.tolist()
+            position = 0
+        self.positions[key] = position + 1
+        return self.blocks[key][position]
+
+    def uniform(self, stream, low, high):
+        """Draws uniformly from [low, high)
+        """
+        return low + (high - low) * self.next_draw(stream, 'uniform')
+
+    def normal(self, stream, mean, sd):
+        """Draws from a normal distribution
+        """
+        return mean + sd * self.next_draw(stream, 'normal')
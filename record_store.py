@@ -0,0 +1,82 @@
+"""Append-only columnar storage for simulation records.
+
+Rows are written into a preallocated NumPy record array that grows
+geometrically, so appending is amortised O(1). A DataFrame is only built
+when the records are read.
+"""
+import numpy as np
+import pandas as pd
+
+# Column layouts shared by the simulations
+macro_columns = {'frame': np.int64, 'population': np.int64,
+                 'food_number': np.int64}
+individual_columns = {'Individual': object, 'Alive at End': bool,
+                      'Time Lived': np.int64, 'Food Eaten': np.int64,
+                      'Replications': np.int64, 'Size': float,
+                      'Velocity': float, 'Sense': float}
+
+
+class record_store:
+    def __init__(self, columns, capacity=1024):
+        """columns maps each column title to its NumPy dtype
+        """
+        self.dtype = np.dtype(list(columns.items()))
+        self.records = np.empty(capacity, dtype=self.dtype)
+        self.length = 0
+        self.cached_frame = None
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def columns(self):
+        return list(self.dtype.names)
+
+    def reserve(self, extra):
+        """Makes room for extra more rows, doubling capacity when full
+        """
+        needed = self.length + extra
+        if needed > len(self.records):
+            capacity = max(needed, 2 * len(self.records))
+            records = np.empty(capacity, dtype=self.dtype)
+            records[:self.length] = self.records[:self.length]
+            self.records = records
+
+    def append(self, row):
+        """Adds a single row, given as a dict keyed by column title
+        """
+        self.reserve(1)
+        self.records[self.length] = tuple(row[name] for name in self.columns)
+        self.length += 1
+        self.cached_frame = None
+
+    def extend(self, columns):
+        """Adds many rows at once, given as a dict of equal length arrays
+        """
+        number = len(columns[self.columns[0]])
+        self.reserve(number)
+        for name in self.columns:
+            self.records[name][self.length:self.length + number] = \
+                columns[name]
+        self.length += number
+        self.cached_frame = None
+
+    def clear(self):
+        """Empties the store, keeping its capacity for reuse
+        """
+        self.length = 0
+        self.cached_frame = None
+
+    def column(self, name):
+        """A view of the filled part of one column
+        """
+        return self.records[name][:self.length]
+
+    def to_dataframe(self):
+        """Builds a DataFrame of the records, reusing it until more are added
+        """
+        if self.cached_frame is None:
+            self.cached_frame = pd.DataFrame(
+                {name: self.column(name) for name in self.columns},
+                columns=self.columns)
+        return self.cached_frame
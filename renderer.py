@@ -0,0 +1,100 @@
+"""Batched pygame rendering of the population.
+
+Individuals and food are drawn as cached square surfaces and name labels
+are rendered once per name, both kept only while still in use, then
+everything is put on screen with a single Surface.blits call. Drawing can
+be limited to every Nth frame so the simulation keeps running at full speed
+in between.
+"""
+
+
+class pygame_renderer:
+    def __init__(self, win_x, win_y, render_every=1):
+        import pygame
+
+        self.pygame = pygame
+        self.render_every = render_every
+
+        # Create window
+        pygame.init()
+        pygame.font.init()
+        self.pop_font = pygame.font.Font('freesansbold.ttf', 32)
+        self.ind_font = pygame.font.Font('freesansbold.ttf', 25)
+        self.win = pygame.display.set_mode((win_x, win_y))
+        pygame.display.set_caption("Genetic Algorithm Animation")
+
+        # Surfaces reused between frames
+        self.squares = {}
+        self.labels = {}
+
+    def handle_events(self):
+        """Processes window events, returning False once the window is quit
+        """
+        running = True
+        for event in self.pygame.event.get():
+            if event.type == self.pygame.QUIT:
+                running = False
+        return running
+
+    def due(self, frame_no):
+        """Whether a frame should be drawn
+        """
+        return frame_no % self.render_every == 0
+
+    def square(self, colour, size, squares):
+        """A filled square of the given colour and size, reused from this
+        frame's squares or the last frame's, and kept in squares
+        """
+        key = (colour, size)
+        surface = squares.get(key)
+        if surface is None:
+            surface = self.squares.get(key)
+            if surface is None:
+                surface = self.pygame.Surface((size, size))
+                surface.fill(colour)
+            squares[key] = surface
+        return surface
+
+    def draw(self, pop_size, ind_x, ind_y, ind_sizes, ind_colours, names,
+             food_x, food_y, food_size=10, food_colour=(0, 255, 0)):
+        """Draws a frame from sequences of individual and food properties
+        """
+        blit_sequence = []
+
+        # Only squares still in use are kept for the next frame
+        squares = {}
+
+        # Food
+        food_square = self.square(food_colour, food_size, squares)
+        for x_pos, y_pos in zip(food_x, food_y):
+            blit_sequence.append((food_square,
+                                  (int(round(x_pos)), int(round(y_pos)))))
+
+        # Individuals and their labels, keeping only labels still in use
+        labels = {}
+        for x_pos, y_pos, size, colour, name in zip(
+                ind_x, ind_y, ind_sizes, ind_colours, names):
+            position = (int(round(x_pos)), int(round(y_pos)))
+            colour = tuple(int(channel) for channel in colour)
+            blit_sequence.append(
+                (self.square(colour, max(int(round(size)), 0), squares),
+                 position))
+            label = self.labels.get(name)
+            if label is None:
+                label = self.ind_font.render(name, True, (255, 255, 255))
+            labels[name] = label
+            blit_sequence.append((label, position))
+        self.labels = labels
+        self.squares = squares
+
+        self.win.fill((0, 0, 0))
+        self.win.blits(blit_sequence, doreturn=False)
+
+        # Population text
+        pop_text = self.pop_font.render("Population: %s" % pop_size, True,
+                                        (255, 255, 255))
+        self.win.blit(pop_text, (20, 20))
+        self.pygame.display.update()
+
+    def close(self):
+        self.pygame.quit()
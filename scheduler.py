@@ -0,0 +1,34 @@
+"""Priority queue of future events keyed on the frame they fall due.
+
+Entries are never updated in place. When plans change a new entry is pushed
+and the superseded one is recognised as stale by its owner when it comes
+due, so rescheduling costs O(log n) and each frame only touches the events
+that fall due in it rather than polling every individual.
+"""
+import heapq
+import itertools
+
+
+class event_queue:
+    def __init__(self):
+        self.heap = []
+
+        # Breaks ties between events due in the same frame in push order
+        self.counter = itertools.count()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, frame, kind, item):
+        """Schedules an event of the given kind for item at frame
+        """
+        heapq.heappush(self.heap, (frame, next(self.counter), kind, item))
+
+    def pop_due(self, frame):
+        """Yields the frame, kind and item of each event due by frame in
+        order, including any pushed for frames already due while iterating
+        """
+        heap = self.heap
+        while heap and heap[0][0] <= frame:
+            due_frame, _, kind, item = heapq.heappop(heap)
+            yield due_frame, kind, item
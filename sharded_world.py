@@ -0,0 +1,391 @@
+"""A large world split into tiles, each simulated by its own process.
+
+Every tile owns the individuals and food inside its bounds and steps them
+with the vectorised engine. Each frame the tiles exchange, through the
+coordinating process:
+
+- ghost food, the food lying within ghost_width of a tile's edge, so that
+  individuals near a border can sense food over it;
+- individuals that have walked over a border, which are handed off to the
+  tile they are now in;
+- the ids of ghost food eaten, so its owner removes it.
+
+One round trip of pipe messages per frame keeps the tiles in lockstep.
+Ghost food is shown to neighbours only after its owner has stepped, so in
+the rare case that individuals on both sides of a border reach the same
+piece in the same frame, both are fed.
+"""
+from multiprocessing import Pipe, Process
+
+import numpy as np
+import pandas as pd
+
+from fitness_stats import merged_stats
+from record_store import individual_columns, macro_columns, record_store
+from spatial_index import food_grid
+from vectorised_population import vectorised_population
+
+# Ids handed out by each tile are offset so they are unique across tiles
+tile_id_stride = 2**40
+
+
+class world_tile(vectorised_population):
+    def __init__(self, tile_index, n_tiles, bounds, ghost_width, pop_size,
+                 food_number, seed=None, world_x=800, world_y=800,
+                 **kwargs):
+        """bounds gives the x_min, x_max, y_min, y_max the tile owns.
+        Lineage is not supported, as each tile's store would hand out the
+        same ids and individuals cross between tiles
+        """
+        if kwargs.get('lineage'):
+            raise ValueError("Sharded worlds do not record lineage")
+        super().__init__(0, 0, 0, seed=seed, win_x=world_x, win_y=world_y,
+                         **kwargs)
+        self.tile_index = tile_index
+        self.n_tiles = n_tiles
+        self.x_min, self.x_max, self.y_min, self.y_max = bounds
+        self.ghost_width = ghost_width
+        self.next_id = tile_index * tile_id_stride + 1
+        self.next_food_id = 0
+        self.eaten_ghost_ids = []
+
+        # The grid also covers the ghost zone around the tile
+        self.food_grid = food_grid(
+            self.x_max - self.x_min + 2 * ghost_width,
+            self.y_max - self.y_min + 2 * ghost_width,
+            x_min=self.x_min - ghost_width, y_min=self.y_min - ghost_width)
+
+        # Food ids encode the owning tile, ghost food is not owned
+        self.food_ids = np.empty(0, dtype=np.int64)
+        self.food_owned = np.empty(0, dtype=bool)
+        self.add_food(food_number)
+        self.add_individuals(
+            np.full(pop_size, float(self.init_velocity * self.speed_up)),
+            np.full(pop_size, float(self.init_size)),
+            np.full(pop_size, float(self.init_sense_region_radius)),
+            self.rng.uniform(self.x_min, self.x_max, pop_size),
+            self.rng.uniform(self.y_min, self.y_max, pop_size))
+
+    def add_food(self, number):
+        """Scatters new food uniformly over the tile
+        """
+        self.place_food(self.rng.uniform(self.x_min, self.x_max, number),
+                        self.rng.uniform(self.y_min, self.y_max, number))
+
+    def place_food(self, food_x_pos, food_y_pos, ids=None):
+        """Adds food at the given positions, owned by this tile unless it
+        comes with the ids of another tile's food
+        """
+        owned = ids is None
+        if owned:
+            number = len(food_x_pos)
+            ids = (np.arange(self.next_food_id, self.next_food_id + number)
+                   * self.n_tiles + self.tile_index)
+            self.next_food_id += number
+        self.food_x_pos = np.append(self.food_x_pos, food_x_pos)
+        self.food_y_pos = np.append(self.food_y_pos, food_y_pos)
+        self.food_ids = np.append(self.food_ids, ids)
+        self.food_owned = np.append(self.food_owned,
+                                    np.full(len(ids), owned))
+        self.food_number = len(self.food_x_pos)
+        self.food_grid.build(self.food_x_pos, self.food_y_pos)
+
+    def remove_food(self, eaten_food):
+        """Removes eaten food, noting any ghost food so its owner is told
+        """
+        if len(eaten_food):
+            ghost = eaten_food[~self.food_owned[eaten_food]]
+            self.eaten_ghost_ids.extend(self.food_ids[ghost].tolist())
+            keep = np.ones(len(self.food_x_pos), dtype=bool)
+            keep[eaten_food] = False
+            self.food_ids = self.food_ids[keep]
+            self.food_owned = self.food_owned[keep]
+        super().remove_food(eaten_food)
+
+    def keep_food(self, keep):
+        """Drops every piece of food whose entry in keep is False
+        """
+        self.food_x_pos = self.food_x_pos[keep]
+        self.food_y_pos = self.food_y_pos[keep]
+        self.food_ids = self.food_ids[keep]
+        self.food_owned = self.food_owned[keep]
+        self.food_number = len(self.food_x_pos)
+
+    def add_state(self, state):
+        """Takes over individuals handed off by another tile
+        """
+        for name in self.state_fields:
+            setattr(self, name, np.concatenate(
+                (getattr(self, name), state[name])))
+        self.pop_size = len(self.ids)
+
+    def record_frame(self):
+        """Frames are recorded for the whole world by the coordinator
+        """
+
+    def border_food(self):
+        """Positions and ids of owned food within the ghost width of an edge
+        """
+        g = self.ghost_width
+        border = ~((self.food_x_pos >= self.x_min + g) &
+                   (self.food_x_pos < self.x_max - g) &
+                   (self.food_y_pos >= self.y_min + g) &
+                   (self.food_y_pos < self.y_max - g))
+        return (self.food_x_pos[border], self.food_y_pos[border],
+                self.food_ids[border])
+
+    def exchange_step(self, immigrants, ghost_food, removed_ids, new_food):
+        """Steps the tile one frame after taking in handed off individuals,
+        neighbours' ghost food, removals of food eaten over the border and
+        regenerated food, returning the individuals leaving the tile, its
+        border food and the ids of ghost food eaten
+        """
+        if len(removed_ids):
+            self.keep_food(~np.isin(self.food_ids, removed_ids))
+        if len(new_food[0]):
+            self.place_food(*new_food)
+        if immigrants is not None:
+            self.add_state(immigrants)
+        self.place_food(*ghost_food)
+
+        self.eaten_ghost_ids = []
+        self.step()
+
+        # Ghost food is sent afresh every frame
+        self.keep_food(self.food_owned)
+
+        # Hand off individuals that have left the tile
+        leaving = ((self.x_pos < self.x_min) | (self.x_pos >= self.x_max) |
+                   (self.y_pos < self.y_min) | (self.y_pos >= self.y_max))
+        emigrants = None
+        if leaving.any():
+            emigrants = {name: getattr(self, name)[leaving]
+                         for name in self.state_fields}
+            self.keep_individuals(~leaving)
+        return (emigrants, self.border_food(),
+                np.array(self.eaten_ghost_ids, dtype=np.int64))
+
+
+def tile_worker(connection, tile_args):
+    """Process loop for one tile, answering the coordinator's messages
+    """
+    tile = world_tile(**tile_args)
+    connection.send(tile.border_food())
+    while True:
+        message, arguments = connection.recv()
+        if message == 'step':
+            result = tile.exchange_step(*arguments)
+            connection.send(result + (tile.pop_size, tile.food_number))
+        elif message == 'finish':
+            immigrants, = arguments
+            if immigrants is not None:
+                tile.add_state(immigrants)
+            connection.send((tile.individual_records(),
+                             tile.dead_individuals, tile.fitness_stats))
+            break
+    connection.close()
+
+
+class sharded_world:
+    def __init__(self, pop_size, food_number, food_regen, seed=None,
+                 world_x=1600, world_y=1600, tiles_x=2, tiles_y=2,
+                 ghost_width=200, **kwargs):
+        """Splits a world_x by world_y world into tiles_x by tiles_y tiles.
+        ghost_width should cover the largest sense region radius, as food
+        further over a border is not seen. Extra keyword arguments are
+        passed to each tile's vectorised_population
+        """
+        self.pop_size = pop_size
+        self.food_number = food_number
+        self.food_regen = food_regen
+        self.world_x = world_x
+        self.world_y = world_y
+        self.tiles_x = tiles_x
+        self.tiles_y = tiles_y
+        self.ghost_width = ghost_width
+        self.speed_up = 10
+        self.frame_no = 0
+        self.dead_individuals = 0
+        self.macro_store = record_store(macro_columns)
+        self.past_individual_store = record_store(
+            dict(individual_columns, Individual=np.int64))
+
+        # Merged from the statistics of the tiles once simulated
+        self.fitness_stats = None
+
+        # Tiles draw from independent streams of one seed, and the world
+        # from its own for placing regenerated food
+        n_tiles = tiles_x * tiles_y
+        seeds = np.random.SeedSequence(seed).spawn(n_tiles + 1)
+        self.rng = np.random.default_rng(seeds[-1])
+        self.tile_x = world_x / tiles_x
+        self.tile_y = world_y / tiles_y
+
+        # Share individuals and food between tiles by area
+        tile_pop = np.full(n_tiles, pop_size // n_tiles)
+        tile_pop[:pop_size % n_tiles] += 1
+        tile_food = np.full(n_tiles, food_number // n_tiles)
+        tile_food[:food_number % n_tiles] += 1
+
+        self.tile_args = []
+        for tile in range(n_tiles):
+            i, j = divmod(tile, tiles_y)
+            bounds = (i * self.tile_x, (i + 1) * self.tile_x,
+                      j * self.tile_y, (j + 1) * self.tile_y)
+            self.tile_args.append(dict(
+                kwargs, tile_index=tile, n_tiles=n_tiles, bounds=bounds,
+                ghost_width=ghost_width, pop_size=int(tile_pop[tile]),
+                food_number=int(tile_food[tile]), seed=seeds[tile],
+                world_x=world_x, world_y=world_y))
+
+    def tile_of(self, x_pos, y_pos):
+        """Index of the tile owning each position
+        """
+        i = np.clip((x_pos // self.tile_x).astype(np.int64), 0,
+                    self.tiles_x - 1)
+        j = np.clip((y_pos // self.tile_y).astype(np.int64), 0,
+                    self.tiles_y - 1)
+        return i * self.tiles_y + j
+
+    def ghost_food_for(self, tile, border_food):
+        """Gathers the border food of every other tile lying in a tile's
+        ghost zone
+        """
+        bounds = self.tile_args[tile]['bounds']
+        g = self.ghost_width
+        food_x, food_y, ids = [np.empty(0)], [np.empty(0)], [
+            np.empty(0, dtype=np.int64)]
+        for other, (x_pos, y_pos, food_ids) in enumerate(border_food):
+            if other == tile:
+                continue
+            near = ((x_pos >= bounds[0] - g) & (x_pos < bounds[1] + g) &
+                    (y_pos >= bounds[2] - g) & (y_pos < bounds[3] + g))
+            food_x.append(x_pos[near])
+            food_y.append(y_pos[near])
+            ids.append(food_ids[near])
+        return (np.concatenate(food_x), np.concatenate(food_y),
+                np.concatenate(ids))
+
+    def simulate(self, max_frames=None):
+        """Runs every tile in its own process until the population dies out
+        or max_frames is reached
+        """
+        n_tiles = len(self.tile_args)
+        connections = []
+        workers = []
+        for tile_args in self.tile_args:
+            parent_end, child_end = Pipe()
+            worker = Process(target=tile_worker, args=(child_end, tile_args))
+            worker.start()
+            child_end.close()
+            connections.append(parent_end)
+            workers.append(worker)
+        border_food = [connection.recv() for connection in connections]
+        immigrants = [None] * n_tiles
+        removed_ids = [np.empty(0, dtype=np.int64)] * n_tiles
+        empty_food = (np.empty(0), np.empty(0))
+        food_regen_wait_time = (1000 / (self.food_regen * self.speed_up)
+                                if self.food_regen else None)
+        finished = False
+
+        try:
+            while self.pop_size and self.frame_no != max_frames:
+                self.frame_no += 1
+
+                # Regenerated food goes to the tile it lands in
+                new_food = [empty_food] * n_tiles
+                if (food_regen_wait_time and
+                        self.frame_no % food_regen_wait_time == 0):
+                    x_pos = self.rng.uniform(0, self.world_x, 1)
+                    y_pos = self.rng.uniform(0, self.world_y, 1)
+                    new_food[self.tile_of(x_pos, y_pos)[0]] = (x_pos, y_pos)
+
+                for tile, connection in enumerate(connections):
+                    connection.send(('step', (
+                        immigrants[tile],
+                        self.ghost_food_for(tile, border_food),
+                        removed_ids[tile], new_food[tile])))
+                results = [connection.recv() for connection in connections]
+
+                # Route handed off individuals and eaten ghost food
+                arriving = [[] for tile in range(n_tiles)]
+                eaten = [[] for tile in range(n_tiles)]
+                border_food = []
+                self.pop_size = 0
+                self.food_number = 0
+                for emigrants, border, eaten_ids, pop_size, food_number in \
+                        results:
+                    if emigrants is not None:
+                        destination = self.tile_of(emigrants['x_pos'],
+                                                   emigrants['y_pos'])
+                        for tile in np.unique(destination):
+                            going = destination == tile
+                            arriving[tile].append(
+                                {name: values[going]
+                                 for name, values in emigrants.items()})
+                    for food_id in eaten_ids:
+                        eaten[food_id % n_tiles].append(food_id)
+                    border_food.append(border)
+                    self.pop_size += pop_size
+                    self.food_number += food_number
+
+                immigrants = [None] * n_tiles
+                for tile in range(n_tiles):
+                    if arriving[tile]:
+                        immigrants[tile] = {
+                            name: np.concatenate([group[name] for group in
+                                                  arriving[tile]])
+                            for name in arriving[tile][0]}
+                        self.pop_size += len(immigrants[tile]['ids'])
+                removed_ids = [np.unique(np.array(ids, dtype=np.int64))
+                               for ids in eaten]
+
+                # Eaten food is no longer shown to neighbours
+                for tile, (x_pos, y_pos, food_ids) in enumerate(border_food):
+                    if len(removed_ids[tile]):
+                        keep = ~np.isin(food_ids, removed_ids[tile])
+                        border_food[tile] = (x_pos[keep], y_pos[keep],
+                                             food_ids[keep])
+                        self.food_number -= np.count_nonzero(~keep)
+
+                self.macro_store.append({'frame': self.frame_no,
+                                         'population': self.pop_size,
+                                         'food_number': self.food_number})
+
+            # Individuals still in transit finish in the tile they reached
+            tile_stats = []
+            for tile, connection in enumerate(connections):
+                connection.send(('finish', (immigrants[tile],)))
+                records, dead_individuals, fitness_stats = connection.recv()
+                self.past_individual_store.extend(records)
+                self.dead_individuals += dead_individuals
+                tile_stats.append(fitness_stats)
+            self.fitness_stats = merged_stats(tile_stats)
+            finished = True
+        finally:
+            # Workers left waiting after an error are stopped
+            for worker in workers:
+                if not finished:
+                    worker.terminate()
+                worker.join()
+
+    @property
+    def past_individual_data(self):
+        """Genes and performance of every individual that has lived
+        """
+        return self.past_individual_store.to_dataframe()
+
+    @property
+    def macro_pop_data(self):
+        """Population size and food number for each frame so far
+        """
+        return self.macro_store.to_dataframe()
+
+
+if __name__ == "__main__":
+    world = sharded_world(pop_size=400, food_number=400, food_regen=20,
+                          seed=0, world_x=3200, world_y=3200, tiles_x=2,
+                          tiles_y=2)
+    world.simulate(max_frames=2000)
+    pd.set_option('display.max_rows', 20)
+    print(world.macro_pop_data)
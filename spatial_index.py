@@ -0,0 +1,227 @@
+"""Uniform grid index over food positions.
+
+Individuals only need to check the food in grid cells that overlap their
+sense region, rather than scanning every piece of food in the world.
+"""
+import math
+
+import numpy as np
+
+
+class food_grid:
+    def __init__(self, win_x, win_y, cell_size=100, brute_force_pairs=2**16,
+                 x_min=0, y_min=0):
+        """Covers win_x by win_y from x_min, y_min, where the static index
+        is offset for worlds split into tiles
+        """
+        self.cell_size = cell_size
+        self.win_x = win_x
+        self.win_y = win_y
+        self.x_min = x_min
+        self.y_min = y_min
+
+        # Below this many individual x food pairs a direct scan is cheaper
+        self.brute_force_pairs = brute_force_pairs
+        self.n_x = max(1, int(math.ceil(win_x / cell_size)))
+        self.n_y = max(1, int(math.ceil(win_y / cell_size)))
+
+        # Incremental index of food objects, keyed by cell
+        self.cells = {}
+
+        # Static index of food arrays, sorted by cell
+        self.static_cell_size = cell_size
+        self.static_n_x = self.n_x
+        self.static_n_y = self.n_y
+        self.cell_start = np.zeros(self.n_x * self.n_y + 1, dtype=np.int64)
+        self.food_order = np.empty(0, dtype=np.int64)
+        self.food_x_pos = np.empty(0)
+        self.food_y_pos = np.empty(0)
+
+    def cell_of(self, x_pos, y_pos):
+        """Finds the grid cell containing a position, clamped to the world
+        """
+        i = min(max(int(x_pos // self.cell_size), 0), self.n_x - 1)
+        j = min(max(int(y_pos // self.cell_size), 0), self.n_y - 1)
+        return i, j
+
+    def add(self, item):
+        """Adds an item with x_pos and y_pos attributes to the index
+        """
+        cell = self.cell_of(item.x_pos, item.y_pos)
+        self.cells.setdefault(cell, []).append(item)
+
+    def remove(self, item):
+        """Removes an item previously added to the index
+        """
+        cell = self.cell_of(item.x_pos, item.y_pos)
+        items = self.cells[cell]
+        items.remove(item)
+        if not items:
+            del self.cells[cell]
+
+    def nearby(self, x_pos, y_pos, radius):
+        """Yields every item in cells overlapping the square around a sense
+        region
+        """
+        radius = abs(radius)
+        i_min, j_min = self.cell_of(x_pos - radius, y_pos - radius)
+        i_max, j_max = self.cell_of(x_pos + radius, y_pos + radius)
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                yield from self.cells.get((i, j), ())
+
+    def nearest_item(self, x_pos, y_pos, radius):
+        """The nearest item strictly inside a sense region, or None if there
+        is none
+        """
+        nearest = None
+        best_dist_sq = radius**2
+        for item in self.nearby(x_pos, y_pos, radius):
+            dist_sq = (x_pos - item.x_pos)**2 + (y_pos - item.y_pos)**2
+            if dist_sq < best_dist_sq:
+                nearest = item
+                best_dist_sq = dist_sq
+        return nearest
+
+    def cell_indices(self, x_pos, y_pos):
+        """Vectorised cell_of over the static index
+        """
+        i = np.clip(((x_pos - self.x_min) // self.static_cell_size).astype(
+            np.int64), 0, self.static_n_x - 1)
+        j = np.clip(((y_pos - self.y_min) // self.static_cell_size).astype(
+            np.int64), 0, self.static_n_y - 1)
+        return i, j
+
+    def build(self, food_x_pos, food_y_pos):
+        """Rebuilds the static index from arrays of food positions, with
+        cells shrunk to hold about one food each when food is dense
+        """
+        area_per_food = self.win_x * self.win_y / max(len(food_x_pos), 1)
+        self.static_cell_size = min(self.cell_size,
+                                    max(1.0, math.sqrt(area_per_food)))
+        self.static_n_x = max(1, int(math.ceil(
+            self.win_x / self.static_cell_size)))
+        self.static_n_y = max(1, int(math.ceil(
+            self.win_y / self.static_cell_size)))
+
+        i, j = self.cell_indices(food_x_pos, food_y_pos)
+        cell = i * self.static_n_y + j
+        self.food_order = np.argsort(cell, kind='stable')
+        counts = np.bincount(cell,
+                             minlength=self.static_n_x * self.static_n_y)
+        self.cell_start = np.zeros(len(counts) + 1, dtype=np.int64)
+        self.cell_start[1:] = np.cumsum(counts)
+        self.food_x_pos = food_x_pos
+        self.food_y_pos = food_y_pos
+
+    def nearest_within(self, x_pos, y_pos, radius):
+        """Finds the index of the nearest built food inside each sense
+        region, returning -1 where there is none
+        """
+        target = np.full(len(x_pos), -1, dtype=np.int64)
+        if not len(self.food_order) or not len(x_pos):
+            return target
+
+        radius_sq = radius**2
+        if len(x_pos) * len(self.food_order) <= self.brute_force_pairs:
+            return self.nearest_by_scan(x_pos, y_pos, radius_sq)
+
+        cell_size = self.static_cell_size
+        n_x = self.static_n_x
+        n_y = self.static_n_y
+        i, j = self.cell_indices(x_pos, y_pos)
+        max_reach = min(int(np.ceil(np.abs(radius).max() / cell_size)),
+                        max(n_x, n_y))
+        best_dist_sq = np.full(len(x_pos), np.inf)
+
+        # Search rings of cells outwards, stopping for each individual once
+        # no unsearched cell can hold anything closer than its best so far
+        searching = np.arange(len(x_pos))
+        for ring in range(max_reach + 1):
+            pair_ind = []
+            pair_food = []
+            for di, dj in self.ring_offsets(ring):
+                cell_i = i[searching] + di
+                cell_j = j[searching] + dj
+
+                # Skip cells lying wholly outside the sense region
+                gap_x = np.maximum(0, np.maximum(
+                    self.x_min + cell_i * cell_size - x_pos[searching],
+                    x_pos[searching] - self.x_min - (cell_i + 1) * cell_size))
+                gap_y = np.maximum(0, np.maximum(
+                    self.y_min + cell_j * cell_size - y_pos[searching],
+                    y_pos[searching] - self.y_min - (cell_j + 1) * cell_size))
+                valid = ((gap_x**2 + gap_y**2 < radius_sq[searching]) &
+                         (cell_i >= 0) & (cell_i < n_x) &
+                         (cell_j >= 0) & (cell_j < n_y))
+                ind = np.flatnonzero(valid)
+                cell = cell_i[ind] * n_y + cell_j[ind]
+                start = self.cell_start[cell]
+                counts = self.cell_start[cell + 1] - start
+                total = counts.sum()
+                if not total:
+                    continue
+                rep = np.repeat(np.arange(len(ind)), counts)
+                offset = np.arange(total) - np.repeat(
+                    np.cumsum(counts) - counts, counts)
+                pair_ind.append(searching[ind[rep]])
+                pair_food.append(self.food_order[start[rep] + offset])
+
+            if pair_ind:
+                pair_ind = np.concatenate(pair_ind)
+                pair_food = np.concatenate(pair_food)
+                dist_sq = ((x_pos[pair_ind] - self.food_x_pos[pair_food])**2 +
+                           (y_pos[pair_ind] - self.food_y_pos[pair_food])**2)
+
+                # Keep the closest food in the ring inside each sense region
+                inside = dist_sq < radius_sq[pair_ind]
+                pair_ind = pair_ind[inside]
+                pair_food = pair_food[inside]
+                dist_sq = dist_sq[inside]
+                ring_dist_sq = np.full(len(x_pos), np.inf)
+                np.minimum.at(ring_dist_sq, pair_ind, dist_sq)
+                closest = dist_sq == ring_dist_sq[pair_ind]
+                ring_target = np.full(len(x_pos), len(self.food_order))
+                np.minimum.at(ring_target, pair_ind[closest],
+                              pair_food[closest])
+                found = np.unique(pair_ind)
+                ring_food = ring_target[found]
+                ring_dist_sq = ring_dist_sq[found]
+
+                # Ties go to the lowest food index, as in a direct scan
+                better = ((ring_dist_sq < best_dist_sq[found]) |
+                          ((ring_dist_sq == best_dist_sq[found]) &
+                           (ring_food < target[found])))
+                target[found[better]] = ring_food[better]
+                best_dist_sq[found[better]] = ring_dist_sq[better]
+
+            # Anything in the next ring is at least this far away
+            ring_gap = ring * cell_size
+            searching = searching[
+                (best_dist_sq[searching] > ring_gap**2) &
+                (radius_sq[searching] > ring_gap**2)]
+            if not len(searching):
+                break
+        return target
+
+    @staticmethod
+    def ring_offsets(ring):
+        """Lists the cell offsets lying on the square ring at a distance
+        """
+        if ring == 0:
+            return [(0, 0)]
+        return ([(di, dj) for di in (-ring, ring)
+                 for dj in range(-ring, ring + 1)] +
+                [(di, dj) for dj in (-ring, ring)
+                 for di in range(-ring + 1, ring)])
+
+    def nearest_by_scan(self, x_pos, y_pos, radius_sq):
+        """Finds the nearest built food in each sense region by checking
+        every food, for when there are too few to be worth the grid
+        """
+        dist_sq = ((x_pos[:, None] - self.food_x_pos)**2 +
+                   (y_pos[:, None] - self.food_y_pos)**2)
+        dist_sq[dist_sq >= radius_sq[:, None]] = np.inf
+        nearest = np.argmin(dist_sq, axis=1)
+        found = np.isfinite(dist_sq[np.arange(len(x_pos)), nearest])
+        return np.where(found, nearest, -1)
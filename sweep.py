@@ -0,0 +1,77 @@
+"""Runs many independent simulations across a process pool.
+
+Each run is described by a config dict holding the population arguments,
+a seed and a frame limit. Runs are independent, so they are spread over
+worker processes and their data merged into single tables afterwards.
+"""
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from vectorised_population import vectorised_population
+
+
+def parameter_grid(seeds, **values):
+    """Lists a config for every combination of the given parameter values
+    and seeds, e.g. parameter_grid(range(4), food_regen=[1, 5, 10])
+    """
+    names = list(values)
+    configs = []
+    for combination in itertools.product(*values.values()):
+        for seed in seeds:
+            config = dict(zip(names, combination))
+            config['seed'] = seed
+            configs.append(config)
+    return configs
+
+
+def run_simulation(config):
+    """Runs a single configuration, returning its macro and individual data
+    labelled with the config
+    """
+    config = dict(config)
+    max_frames = config.pop('max_frames', None)
+    pop = vectorised_population(**config)
+    pop.simulate(max_frames=max_frames)
+
+    macro_pop_data = pop.macro_pop_data.copy()
+    past_individual_data = pop.past_individual_data.copy()
+    for name, value in config.items():
+        macro_pop_data[name] = value
+        past_individual_data[name] = value
+    return macro_pop_data, past_individual_data
+
+
+def run_sweep(configs, processes=None, max_frames=None, **defaults):
+    """Runs every config across a pool of processes. Arguments shared by all
+    runs, e.g. pop_size, may be given as keyword defaults
+
+    Returns the merged macro population data and individual data, with a
+    'run' column giving each config's position in configs
+    """
+    full_configs = []
+    for config in configs:
+        full_config = dict(defaults, max_frames=max_frames)
+        full_config.update(config)
+        full_configs.append(full_config)
+
+    with ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(run_simulation, full_configs))
+
+    macro_frames = []
+    individual_frames = []
+    for run, (macro_pop_data, past_individual_data) in enumerate(results):
+        macro_pop_data.insert(0, 'run', run)
+        past_individual_data.insert(0, 'run', run)
+        macro_frames.append(macro_pop_data)
+        individual_frames.append(past_individual_data)
+    return (pd.concat(macro_frames, ignore_index=True),
+            pd.concat(individual_frames, ignore_index=True))
+
+
+if __name__ == "__main__":
+    configs = parameter_grid(range(4), food_regen=[1, 5, 10])
+    macro_pop_data, past_individual_data = run_sweep(
+        configs, max_frames=5000, pop_size=10, food_number=100)
+    print(macro_pop_data.groupby(['food_regen', 'seed']).population.mean())
@@ -0,0 +1,119 @@
+"""Streams per-frame population statistics to disk in chunks.
+
+Rather than holding a row for every frame in memory until the run ends,
+rows are buffered in a small record_store and flushed to a CSV, Parquet or
+raw binary file every chunk_size rows, so memory stays flat and the file can
+be followed while the run is going. A Parquet file is only readable once its
+footer is written, so Parquet telemetry is a directory holding one part file
+per flush, each finished before it is given its name.
+"""
+import glob
+import os
+
+import numpy as np
+import pandas as pd
+
+from record_store import macro_columns, record_store
+
+telemetry_columns = dict(macro_columns,
+                         velocity_mean=float, velocity_std=float,
+                         size_mean=float, size_std=float,
+                         sense_mean=float, sense_std=float)
+
+
+def gene_summary(velocity, size, sense_region_radius):
+    """Mean and standard deviation of each gene over the living population
+    """
+    summary = {}
+    for name, genes in (('velocity', velocity), ('size', size),
+                        ('sense', sense_region_radius)):
+        if len(genes):
+            summary['%s_mean' % name] = np.mean(genes)
+            summary['%s_std' % name] = np.std(genes)
+        else:
+            summary['%s_mean' % name] = np.nan
+            summary['%s_std' % name] = np.nan
+    return summary
+
+
+def read_telemetry(path, file_format='csv'):
+    """Reads back a telemetry file, or directory of Parquet parts, which
+    may still be being written
+    """
+    if file_format == 'csv':
+        return pd.read_csv(path)
+    if file_format == 'parquet':
+        return pd.read_parquet(path)
+    dtype = np.dtype(list(telemetry_columns.items()))
+    return pd.DataFrame(np.fromfile(path, dtype=dtype))
+
+
+class telemetry_writer:
+    def __init__(self, path, file_format='csv', chunk_size=1000,
+                 decimation=1):
+        """Writes every decimation-th frame to path, where file_format is
+        'csv', 'parquet' (needs pyarrow) or 'binary'. Parquet telemetry
+        is written as part files in the directory path
+        """
+        if file_format not in ('csv', 'parquet', 'binary'):
+            raise ValueError("Unknown telemetry format %r" % file_format)
+        self.path = path
+        self.file_format = file_format
+        self.chunk_size = chunk_size
+        self.decimation = decimation
+        self.buffer = record_store(telemetry_columns, capacity=chunk_size)
+        self.rows_written = 0
+        self.parts_written = 0
+
+        # Start a fresh file or directory
+        if file_format == 'parquet':
+            os.makedirs(path, exist_ok=True)
+            for part_path in glob.glob(os.path.join(path, 'part-*.parquet')):
+                os.remove(part_path)
+        else:
+            open(path, 'wb').close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def due(self, frame_no):
+        """Whether a frame should be recorded given the decimation
+        """
+        return frame_no % self.decimation == 0
+
+    def record(self, row):
+        """Buffers a row, flushing the buffer to disk once it is full
+        """
+        self.buffer.append(row)
+        if len(self.buffer) == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Writes out any buffered rows
+        """
+        if not len(self.buffer):
+            return
+        records = self.buffer.records[:len(self.buffer)]
+        if self.file_format == 'csv':
+            pd.DataFrame(records).to_csv(self.path, mode='a', index=False,
+                                         header=self.rows_written == 0)
+        elif self.file_format == 'parquet':
+            # Readers skip hidden files, so a part is never seen half written
+            part_name = 'part-%06d.parquet' % self.parts_written
+            temp_path = os.path.join(self.path, '.%s.tmp' % part_name)
+            pd.DataFrame(records).to_parquet(temp_path, index=False)
+            os.replace(temp_path, os.path.join(self.path, part_name))
+            self.parts_written += 1
+        else:
+            with open(self.path, 'ab') as binary_file:
+                records.tofile(binary_file)
+        self.rows_written += len(self.buffer)
+        self.buffer.clear()
+
+    def close(self):
+        """Flushes remaining rows
+        """
+        self.flush()
@@ -0,0 +1,73 @@
+"""The compiled kernels must step the world exactly as the NumPy code does.
+"""
+import numpy as np
+import pytest
+
+from sharded_world import world_tile
+from vectorised_population import vectorised_population
+
+pytest.importorskip("numba")
+
+
+def assert_same_state(reference, candidate):
+    for name in reference.state_fields:
+        np.testing.assert_array_equal(getattr(reference, name),
+                                      getattr(candidate, name), err_msg=name)
+    np.testing.assert_array_equal(reference.food_x_pos, candidate.food_x_pos)
+    np.testing.assert_array_equal(reference.food_y_pos, candidate.food_y_pos)
+
+
+def step_both(reference, candidate, frames):
+    for frame in range(frames):
+        if not reference.pop_size:
+            break
+        reference.step()
+        candidate.step()
+        assert_same_state(reference, candidate)
+
+
+@pytest.mark.parametrize('pop_size, food_number, food_regen', [
+    (1, 10, 5), (10, 100, 5), (1000, 1000, 5), (5000, 100, 50),
+    (200, 0, 0)])
+def test_step_parity(pop_size, food_number, food_regen):
+    reference = vectorised_population(pop_size, food_number, food_regen,
+                                      seed=0, backend='numpy')
+    candidate = vectorised_population(pop_size, food_number, food_regen,
+                                      seed=0, backend='numba')
+    step_both(reference, candidate, 300)
+
+
+def test_large_world_parity():
+    reference = vectorised_population(2000, 2000, 20, seed=1,
+                                      backend='numpy', win_x=3000,
+                                      win_y=2000)
+    candidate = vectorised_population(2000, 2000, 20, seed=1,
+                                      backend='numba', win_x=3000,
+                                      win_y=2000)
+    step_both(reference, candidate, 200)
+
+
+@pytest.mark.parametrize('tile_index, bounds', [
+    (1, (800, 1600, 0, 800)), (3, (800, 1600, 800, 1600))])
+def test_offset_grid_parity(tile_index, bounds):
+    """Tiles index food in grids offset to their corner
+    """
+    tiles = [world_tile(tile_index, 4, bounds, 200, 500, 500, seed=2,
+                        world_x=1600, world_y=1600, backend=backend)
+             for backend in ('numpy', 'numba')]
+    assert tiles[0].food_grid.x_min == bounds[0] - 200
+    step_both(*tiles, 200)
+
+
+def test_fast_forward_parity():
+    reference = vectorised_population(1000, 1000, 5, seed=3,
+                                      backend='numpy')
+    candidate = vectorised_population(1000, 1000, 5, seed=3,
+                                      backend='numba')
+    for span in (1, 10, 100, 10, 1):
+        reference.fast_forward(span)
+        candidate.fast_forward(span)
+        assert_same_state(reference, candidate)
+        reference.step()
+        candidate.step()
+        assert_same_state(reference, candidate)
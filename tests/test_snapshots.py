@@ -0,0 +1,62 @@
+"""A population loaded from a snapshot must carry on the original run.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from vectorised_population import vectorised_population
+
+
+def assert_same_state(original, resumed):
+    for name in original.state_fields:
+        np.testing.assert_array_equal(getattr(original, name),
+                                      getattr(resumed, name), err_msg=name)
+    np.testing.assert_array_equal(original.food_x_pos, resumed.food_x_pos)
+    np.testing.assert_array_equal(original.food_y_pos, resumed.food_y_pos)
+
+
+@pytest.mark.parametrize('win_x, win_y', [(800, 800), (3000, 3000),
+                                          (2400, 1200)])
+def test_resume_steps_identically(tmp_path, win_x, win_y):
+    path = tmp_path / 'snapshot.npz'
+    original = vectorised_population(2000, 2000, 50, seed=0, win_x=win_x,
+                                     win_y=win_y)
+    original.simulate(max_frames=20)
+    original.save_snapshot(path)
+    resumed = vectorised_population.load_snapshot(path)
+    assert (resumed.win_x, resumed.win_y) == (win_x, win_y)
+    for frame in range(200):
+        original.step()
+        resumed.step()
+        assert_same_state(original, resumed)
+
+
+@pytest.mark.parametrize('keep_individual_data', [True, False])
+def test_resumed_run_matches_uninterrupted_run(tmp_path,
+                                               keep_individual_data):
+    path = tmp_path / 'snapshot.npz'
+    uninterrupted = vectorised_population(
+        10, 200, 5, seed=3, win_x=1200, win_y=1000,
+        keep_individual_data=keep_individual_data)
+    uninterrupted.simulate(max_frames=3000)
+
+    first_part = vectorised_population(
+        10, 200, 5, seed=3, win_x=1200, win_y=1000,
+        keep_individual_data=keep_individual_data)
+    first_part.simulate(max_frames=1000)
+    first_part.save_snapshot(path)
+    resumed = vectorised_population.load_snapshot(path)
+    assert resumed.keep_individual_data == keep_individual_data
+
+    # Loading keeps the individual data exactly as it was snapshotted
+    pd.testing.assert_frame_equal(resumed.past_individual_data,
+                                  first_part.past_individual_data)
+
+    resumed.simulate(max_frames=3000)
+    assert_same_state(uninterrupted, resumed)
+    pd.testing.assert_frame_equal(resumed.past_individual_data,
+                                  uninterrupted.past_individual_data)
+    pd.testing.assert_frame_equal(resumed.macro_pop_data,
+                                  uninterrupted.macro_pop_data)
+    np.testing.assert_array_equal(resumed.fitness_stats.counts,
+                                  uninterrupted.fitness_stats.counts)
@@ -0,0 +1,34 @@
+"""Both engines must pick the same food from the grid.
+"""
+import numpy as np
+
+from spatial_index import food_grid
+
+
+class item:
+    def __init__(self, x_pos, y_pos):
+        self.x_pos = x_pos
+        self.y_pos = y_pos
+
+
+def test_nearest_item_matches_nearest_within():
+    rng = np.random.default_rng(0)
+    food_x_pos = rng.uniform(0, 800, 500)
+    food_y_pos = rng.uniform(0, 800, 500)
+    grid = food_grid(800, 800)
+    grid.build(food_x_pos, food_y_pos)
+    items = [item(x_pos, y_pos) for x_pos, y_pos in zip(food_x_pos,
+                                                          food_y_pos)]
+    for food_piece in items:
+        grid.add(food_piece)
+
+    x_pos = rng.uniform(0, 800, 300)
+    y_pos = rng.uniform(0, 800, 300)
+    radius = rng.uniform(0, 150, 300)
+    target = grid.nearest_within(x_pos, y_pos, radius)
+    for k in range(len(x_pos)):
+        nearest = grid.nearest_item(x_pos[k], y_pos[k], radius[k])
+        if target[k] < 0:
+            assert nearest is None
+        else:
+            assert nearest is items[target[k]]
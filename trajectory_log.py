@@ -0,0 +1,640 @@
+"""Recording runs to compact logs that replay without re-simulating.
+
+Each recorded frame is stored as the difference from the one before: the
+individuals born with their genes, the ids of those that died, how far
+every survivor moved, the lives lengthened by eating and the food eaten
+and added. Populations tell the recorder of births, deaths and food eaten
+and added as they happen, so only the survivors are compared between
+frames. Positions are kept as fixed point integers, so the moves are
+small integers that compress well and replay exactly. Life left counts
+down one a frame, so only the changes eating makes to it are stored and
+colours are worked out from it on replay. Frames are grouped into
+chunks, each compressed with zlib and starting from an empty world so it
+decodes on its own, and every chunk is prefixed with its first frame and
+length. Seeking to a frame then reads only the chunk holding it, and a log
+cut short by a crash is still readable up to its last whole chunk.
+"""
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from colour_tables import life_colours
+
+# File header: magic, world width and height, fixed point scale
+file_header = struct.Struct('<4sddq')
+magic = b'TRJ1'
+
+# Chunk header: first frame, number of frames, compressed length
+chunk_header = struct.Struct('<qqq')
+
+# Fields stored for each kind of event, in the order they are written
+event_fields = (
+    ('births', (('ids', np.int64, 1), ('x_pos', np.int32, 1),
+                ('y_pos', np.int32, 1), ('size', np.float32, 1),
+                ('life_left', np.int64, 1), ('velocity', np.float32, 1),
+                ('sense_region_radius', np.float32, 1))),
+    ('deaths', (('ids', np.int64, 1),)),
+    ('moves', (('x_pos', np.int32, 1), ('y_pos', np.int32, 1))),
+    ('life_changes', (('index', np.int32, 1), ('life_left', np.int64, 1))),
+    ('food_removed', (('x_pos', np.int32, 1), ('y_pos', np.int32, 1))),
+    ('food_added', (('x_pos', np.int32, 1), ('y_pos', np.int32, 1))),
+)
+
+individual_fields = ('ids', 'x_pos', 'y_pos', 'size', 'life_left',
+                     'velocity', 'sense_region_radius')
+
+
+def food_keys(x_pos, y_pos):
+    """Packs fixed point food positions into one integer each
+    """
+    return (x_pos.astype(np.int64) << 32) | (y_pos.astype(np.int64) &
+                                             0xffffffff)
+
+
+class world_state:
+    def __init__(self):
+        """An empty world of individuals sorted by id and food, in fixed
+        point
+        """
+        self.ids = np.empty(0, dtype=np.int64)
+        self.x_pos = np.empty(0, dtype=np.int32)
+        self.y_pos = np.empty(0, dtype=np.int32)
+        self.size = np.empty(0, dtype=np.float32)
+        self.life_left = np.empty(0, dtype=np.int64)
+        self.velocity = np.empty(0, dtype=np.float32)
+        self.sense_region_radius = np.empty(0, dtype=np.float32)
+        self.food_x_pos = np.empty(0, dtype=np.int32)
+        self.food_y_pos = np.empty(0, dtype=np.int32)
+        self.food_keys = np.empty(0, dtype=np.int64)
+        self.frame_no = None
+
+    def apply(self, frame_no, events):
+        """Moves the world on to frame_no by that frame's events
+        """
+        births, deaths, moves, life_changes, food_removed, food_added = \
+            events
+
+        # Drop the dead, then move the survivors and count down their lives
+        if len(deaths['ids']):
+            keep = ~np.isin(self.ids, deaths['ids'], assume_unique=True)
+            for name in individual_fields:
+                setattr(self, name, getattr(self, name)[keep])
+        self.x_pos = self.x_pos + moves['x_pos']
+        self.y_pos = self.y_pos + moves['y_pos']
+        if self.frame_no is not None:
+            self.life_left = self.life_left - (frame_no - self.frame_no)
+        self.life_left[life_changes['index']] = life_changes['life_left']
+        self.frame_no = frame_no
+
+        # Add the newborns, keeping individuals sorted by id
+        if len(births['ids']):
+            in_order = (not len(self.ids) or
+                        births['ids'][0] > self.ids[-1])
+            for name in individual_fields:
+                setattr(self, name, np.concatenate(
+                    (getattr(self, name), births[name])))
+            if not in_order:
+                order = np.argsort(self.ids, kind='stable')
+                for name in individual_fields:
+                    setattr(self, name, getattr(self, name)[order])
+
+        # Food eaten and added
+        if len(food_removed['x_pos']):
+            keep = ~np.isin(self.food_keys,
+                            food_keys(food_removed['x_pos'],
+                                      food_removed['y_pos']))
+            self.food_x_pos = self.food_x_pos[keep]
+            self.food_y_pos = self.food_y_pos[keep]
+            self.food_keys = self.food_keys[keep]
+        if len(food_added['x_pos']):
+            self.food_x_pos = np.concatenate((self.food_x_pos,
+                                              food_added['x_pos']))
+            self.food_y_pos = np.concatenate((self.food_y_pos,
+                                              food_added['y_pos']))
+            self.food_keys = np.concatenate((
+                self.food_keys,
+                food_keys(food_added['x_pos'], food_added['y_pos'])))
+
+
+def narrowest_int(values):
+    """The smallest signed integer type holding every value
+    """
+    if not len(values):
+        return np.dtype(np.int8)
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def encode_chunk(chunk, frames, pop_sizes, level):
+    """Concatenates each field of a chunk's frames and compresses them,
+    storing integer fields in the narrowest type that holds them
+    """
+    counts = np.array([[len(events[kind][fields[0][0]])
+                        for kind, (_, fields) in enumerate(event_fields)]
+                       for events in chunk], dtype=np.int64)
+    columns = []
+    for kind, (_, fields) in enumerate(event_fields):
+        for name, dtype, width in fields:
+            values = np.concatenate([events[kind][name] for events in chunk])
+            if np.dtype(dtype).kind == 'i':
+                values = values.astype(narrowest_int(values))
+            else:
+                values = values.astype(dtype, copy=False)
+            columns.append(values)
+    item_sizes = np.array([values.itemsize for values in columns],
+                          dtype=np.uint8)
+    parts = [counts.tobytes(), np.array(frames, dtype=np.int64).tobytes(),
+             np.array(pop_sizes, dtype=np.int64).tobytes(),
+             item_sizes.tobytes()]
+    parts.extend(values.tobytes() for values in columns)
+    return zlib.compress(b''.join(parts), level)
+
+
+class trajectory_recorder:
+    def __init__(self, path, win_x=800, win_y=800, chunk_frames=256,
+                 scale=4, level=1, decimation=10, max_pending=16):
+        """Writes a log to path of a win_x by win_y world, with positions
+        kept to 1/scale of a pixel and chunk_frames frames compressed at
+        zlib level into each chunk. Only every decimation-th frame is
+        recorded. Recording takes a copy of the world for each recorded
+        frame and leaves the diffing, compression and writing to a
+        background thread, waiting for it once max_pending frames are
+        queued, so with a core to spare the run only pays for the copies and
+        the events noted, about 2% at the default decimation of 10. The
+        background work costs about a step per recorded frame, so where
+        there is no spare core it slows the run by around 1/decimation
+        more, and recording every frame can nearly double the run time
+        """
+        self.path = path
+        self.chunk_frames = chunk_frames
+        self.scale = scale
+        self.level = level
+        self.decimation = decimation
+        self.max_pending = max_pending
+        self.writer = ThreadPoolExecutor(max_workers=1)
+        self.pending = deque()
+        self.file = open(path, 'wb')
+        self.file.write(file_header.pack(magic, win_x, win_y, scale))
+        self.frames_queued = 0
+
+        # Frames being gathered into a chunk by the writer thread
+        self.frames = []
+        self.pop_sizes = []
+        self.chunk = []
+        self.previous = world_state()
+
+        # Events noted by the population since the last recorded frame
+        self.births = []
+        self.deaths = []
+        self.eaten = []
+        self.added = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def due(self, frame_no):
+        """Whether a frame should be recorded given the decimation
+        """
+        return frame_no % self.decimation == 0
+
+    def quantise(self, values):
+        return np.rint(np.asarray(values, dtype=float) *
+                       self.scale).astype(np.int32)
+
+    @property
+    def starting_chunk(self):
+        """Whether the next frame recorded starts a chunk, and so needs the
+        whole world including the food
+        """
+        return self.frames_queued == 0
+
+    def born(self, ids):
+        """Notes individuals born since the last recorded frame
+        """
+        self.births.append(np.asarray(ids, dtype=np.int64).reshape(-1))
+
+    def died(self, ids):
+        """Notes individuals removed since the last recorded frame
+        """
+        self.deaths.append(np.asarray(ids, dtype=np.int64).reshape(-1))
+
+    def food_eaten(self, x_pos, y_pos):
+        """Notes food removed since the last recorded frame
+        """
+        self.eaten.append(np.column_stack((x_pos, y_pos)))
+
+    def food_added(self, x_pos, y_pos):
+        """Notes food placed since the last recorded frame
+        """
+        self.added.append(np.column_stack((x_pos, y_pos)))
+
+    def take_events(self):
+        """The births, deaths and food eaten and added noted since the last
+        recorded frame
+        """
+        events = (np.concatenate([np.empty(0, dtype=np.int64)] +
+                                 self.births),
+                  np.concatenate([np.empty(0, dtype=np.int64)] +
+                                 self.deaths),
+                  np.concatenate([np.empty((0, 2))] + self.eaten),
+                  np.concatenate([np.empty((0, 2))] + self.added))
+        self.births, self.deaths, self.eaten, self.added = [], [], [], []
+        return events
+
+    def submit(self, task, *arguments):
+        """Queues work for the writer thread, first waiting for the oldest
+        work once max_pending are queued
+        """
+        while self.pending and (self.pending[0].done() or
+                                len(self.pending) >= self.max_pending):
+            self.pending.popleft().result()
+        self.pending.append(self.writer.submit(task, *arguments))
+
+    def record(self, frame_no, pop_size, state):
+        """Queues a frame for the log, where state holds the record_state of
+        a population. Births, deaths and food eaten and added must have
+        been noted as they happened, and the food in state is only read at
+        the start of a chunk
+        """
+        events = self.take_events()
+        starting = self.starting_chunk
+        state = {name: np.array(values) for name, values in state.items()
+                 if starting or not name.startswith('food_')}
+        self.submit(self.add_frame, frame_no, pop_size, state, events,
+                    starting)
+        self.frames_queued += 1
+        if self.frames_queued == self.chunk_frames:
+            self.flush()
+
+    def add_frame(self, frame_no, pop_size, state, events, starting):
+        """Diffs a frame against the one before on the writer thread, so
+        that only the survivors are compared
+        """
+        previous = self.previous
+        ids = np.asarray(state['ids'], dtype=np.int64)
+        x_pos = self.quantise(state['x_pos'])
+        y_pos = self.quantise(state['y_pos'])
+        life_left = np.asarray(state['life_left'], dtype=np.int64)
+
+        # Individuals are compared in id order
+        order = None
+        if len(ids) > 1 and not np.all(ids[1:] > ids[:-1]):
+            order = np.argsort(ids, kind='stable')
+            ids = ids[order]
+            x_pos = x_pos[order]
+            y_pos = y_pos[order]
+            life_left = life_left[order]
+
+        # A chunk starts with everything in the world as new
+        born_ids, dead_ids, eaten, added = events
+        if starting:
+            born = np.ones(len(ids), dtype=bool)
+            survived = np.zeros(len(previous.ids), dtype=bool)
+            dead_ids = np.empty(0, dtype=np.int64)
+            eaten = np.empty(0, dtype=np.int64)
+            food_x_pos = self.quantise(state['food_x_pos'])
+            food_y_pos = self.quantise(state['food_y_pos'])
+        else:
+            # Leave out what was undone again between recorded frames
+            if len(born_ids) and len(dead_ids):
+                brief = np.isin(born_ids, dead_ids)
+                born_ids, dead_ids = born_ids[~brief], dead_ids[
+                    ~np.isin(dead_ids, born_ids[brief])]
+            eaten = food_keys(self.quantise(eaten[:, 0]),
+                              self.quantise(eaten[:, 1]))
+            added = food_keys(self.quantise(added[:, 0]),
+                              self.quantise(added[:, 1]))
+            if len(eaten) and len(added):
+                brief = np.isin(added, eaten)
+                added, eaten = added[~brief], eaten[
+                    ~np.isin(eaten, added[brief])]
+
+            born = np.zeros(len(ids), dtype=bool)
+            born[np.searchsorted(ids, born_ids)] = True
+            survived = np.ones(len(previous.ids), dtype=bool)
+            survived[np.searchsorted(previous.ids, dead_ids)] = False
+            food_x_pos = (added >> 32).astype(np.int32)
+            food_y_pos = added.astype(np.int32)
+            if len(ids) - len(born_ids) != len(previous.ids) - len(dead_ids):
+                raise ValueError("Frame %d does not follow from the births "
+                                 "and deaths noted" % frame_no)
+
+        # Genes are only needed for the newborns
+        births = {'ids': ids[born], 'x_pos': x_pos[born],
+                  'y_pos': y_pos[born], 'life_left': life_left[born]}
+        born_rows = np.flatnonzero(born)
+        if order is not None:
+            born_rows = order[born_rows]
+        for name in ('size', 'velocity', 'sense_region_radius'):
+            births[name] = np.asarray(state[name],
+                                      dtype=np.float32)[born_rows]
+
+        # Lives changed other than by counting down
+        stayed = ~born
+        life_changed = np.flatnonzero(
+            life_left[stayed] != previous.life_left[survived] -
+            (frame_no - (previous.frame_no or 0)))
+
+        self.chunk.append((
+            births,
+            {'ids': dead_ids},
+            {'x_pos': x_pos[stayed] - previous.x_pos[survived],
+             'y_pos': y_pos[stayed] - previous.y_pos[survived]},
+            {'index': life_changed.astype(np.int32),
+             'life_left': life_left[stayed][life_changed]},
+            {'x_pos': (eaten >> 32).astype(np.int32),
+             'y_pos': eaten.astype(np.int32)},
+            {'x_pos': food_x_pos, 'y_pos': food_y_pos}))
+        self.frames.append(frame_no)
+        self.pop_sizes.append(pop_size)
+
+        # Only what the next frame is compared against is kept
+        previous.ids = ids
+        previous.x_pos = x_pos
+        previous.y_pos = y_pos
+        previous.life_left = life_left
+        previous.frame_no = frame_no
+
+    def write_chunk(self):
+        """Compresses and writes the frames gathered on the writer thread
+        as a chunk, the next chunk starting from an empty world
+        """
+        payload = encode_chunk(self.chunk, self.frames, self.pop_sizes,
+                               self.level)
+        self.file.write(chunk_header.pack(self.frames[0], len(self.frames),
+                                          len(payload)))
+        self.file.write(payload)
+        self.file.flush()
+        self.chunk = []
+        self.frames = []
+        self.pop_sizes = []
+        self.previous = world_state()
+
+    def flush(self, wait=False):
+        """Ends the chunk being recorded, so it is written out by the
+        writer thread. With wait, returns once every chunk is on disk
+        """
+        if self.frames_queued:
+            self.submit(self.write_chunk)
+            self.frames_queued = 0
+        if wait:
+            while self.pending:
+                self.pending.popleft().result()
+
+    def close(self):
+        self.flush(wait=True)
+        self.writer.shutdown()
+        self.file.close()
+
+
+class trajectory_log:
+    def __init__(self, path):
+        """Opens a log for reading, indexing where each chunk starts
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        file_magic, self.win_x, self.win_y, self.scale = \
+            file_header.unpack(self.file.read(file_header.size))
+        if file_magic != magic:
+            raise ValueError("%s is not a trajectory log" % path)
+
+        # Hop over the chunk headers to build the seek index, stopping at
+        # a chunk cut short
+        file_size = self.file.seek(0, 2)
+        self.file.seek(file_header.size)
+        first_frames, self.chunks = [], []
+        while True:
+            header = self.file.read(chunk_header.size)
+            if len(header) < chunk_header.size:
+                break
+            first_frame, n_frames, length = chunk_header.unpack(header)
+            offset = self.file.tell()
+            if offset + length > file_size:
+                break
+            first_frames.append(first_frame)
+            self.chunks.append((offset, length, n_frames))
+            self.file.seek(length, 1)
+        self.first_frames = np.array(first_frames, dtype=np.int64)
+        self.loaded_chunk = None
+        self.cursor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def load_chunk(self, chunk):
+        """Decompresses a chunk into its frames, population sizes and the
+        events of each frame, keeping the last one loaded
+        """
+        if self.loaded_chunk is not None and self.loaded_chunk[0] == chunk:
+            return self.loaded_chunk[1]
+        offset, length, n_frames = self.chunks[chunk]
+        self.file.seek(offset)
+        data = zlib.decompress(self.file.read(length))
+        position = 0
+
+        def take(dtype, count):
+            nonlocal position
+            values = np.frombuffer(data, dtype=dtype, count=count,
+                                   offset=position)
+            position += values.nbytes
+            return values
+
+        counts = take(np.int64, n_frames * len(event_fields)).reshape(
+            n_frames, len(event_fields))
+        frames = take(np.int64, n_frames)
+        pop_sizes = take(np.int64, n_frames)
+        item_sizes = iter(take(np.uint8, sum(
+            len(fields) for kind, fields in event_fields)))
+        columns = []
+        for kind, (_, fields) in enumerate(event_fields):
+            total = int(counts[:, kind].sum())
+            kind_columns = {}
+            for name, dtype, width in fields:
+                stored = np.dtype(dtype)
+                if stored.kind == 'i':
+                    stored = np.dtype('i%d' % next(item_sizes))
+                else:
+                    next(item_sizes)
+                values = take(stored, total * width).astype(dtype)
+                kind_columns[name] = values.reshape(
+                    (total, width) if width > 1 else (total,))
+            columns.append(kind_columns)
+
+        # Split each kind of event back into frames
+        events = []
+        starts = np.vstack((np.zeros(len(event_fields), dtype=np.int64),
+                            np.cumsum(counts, axis=0)))
+        for frame in range(n_frames):
+            events.append(tuple(
+                {name: values[starts[frame, kind]:starts[frame + 1, kind]]
+                 for name, values in columns[kind].items()}
+                for kind in range(len(event_fields))))
+        self.loaded_chunk = (chunk, (frames, pop_sizes, events))
+        return self.loaded_chunk[1]
+
+    @property
+    def first_frame(self):
+        return int(self.first_frames[0]) if len(self.first_frames) else None
+
+    @property
+    def last_frame(self):
+        if not len(self.first_frames):
+            return None
+        frames, pop_sizes, events = self.load_chunk(len(self.chunks) - 1)
+        return int(frames[-1])
+
+    def seek(self, frame_no):
+        """The world at the last recorded frame at or before frame_no, as
+        the frame, population size and a dict like a population's
+        view_state. Moving forwards within a chunk only applies the frames
+        in between
+        """
+        chunk = max(int(np.searchsorted(self.first_frames, frame_no,
+                                        side='right')) - 1, 0)
+        frames, pop_sizes, events = self.load_chunk(chunk)
+        target = max(int(np.searchsorted(frames, frame_no,
+                                         side='right')) - 1, 0)
+        if (self.cursor is None or self.cursor[0] != chunk or
+                self.cursor[1] > target):
+            self.cursor = (chunk, -1, world_state())
+        chunk, position, state = self.cursor
+        for frame in range(position + 1, target + 1):
+            state.apply(int(frames[frame]), events[frame])
+        self.cursor = (chunk, target, state)
+        return int(frames[target]), int(pop_sizes[target]), self.view(state)
+
+    def view(self, state):
+        scale = self.scale
+        return {'ids': state.ids,
+                'x_pos': state.x_pos / scale,
+                'y_pos': state.y_pos / scale,
+                'size': state.size, 'life_left': state.life_left,
+                'colours': life_colours(state.life_left),
+                'velocity': state.velocity,
+                'sense_region_radius': state.sense_region_radius,
+                'food_x_pos': state.food_x_pos / scale,
+                'food_y_pos': state.food_y_pos / scale}
+
+    def iter_frames(self, start=None, stop=None, every=1):
+        """Yields the frame, population size and view of every every-th
+        recorded frame from start up to but not including stop
+        """
+        for chunk in range(len(self.chunks)):
+            frames, pop_sizes, events = self.load_chunk(chunk)
+            for frame_no in frames:
+                if start is not None and frame_no < start:
+                    continue
+                if stop is not None and frame_no >= stop:
+                    return
+                if (frame_no - (start or 0)) % every == 0:
+                    yield self.seek(frame_no)
+
+    def to_dataframe(self, start=None, stop=None, every=1):
+        """Positions, sizes, colours and genes of the individuals alive in
+        each exported frame, one row per individual per frame
+        """
+        tables = []
+        for frame_no, pop_size, state in self.iter_frames(start, stop,
+                                                          every):
+            colours = state['colours']
+            tables.append(pd.DataFrame({
+                'frame': frame_no, 'id': state['ids'],
+                'x_pos': state['x_pos'], 'y_pos': state['y_pos'],
+                'size': state['size'], 'red': colours[:, 0],
+                'green': colours[:, 1], 'blue': colours[:, 2],
+                'life_left': state['life_left'],
+                'velocity': state['velocity'],
+                'sense_region_radius': state['sense_region_radius']}))
+        return pd.concat(tables, ignore_index=True)
+
+    def food_dataframe(self, start=None, stop=None, every=1):
+        """Food positions in each exported frame, one row per piece
+        """
+        tables = []
+        for frame_no, pop_size, state in self.iter_frames(start, stop,
+                                                          every):
+            tables.append(pd.DataFrame({'frame': frame_no,
+                                        'x_pos': state['food_x_pos'],
+                                        'y_pos': state['food_y_pos']}))
+        return pd.concat(tables, ignore_index=True)
+
+    def close(self):
+        self.file.close()
+
+
+def export_log(path, out_path, start=None, stop=None, every=1,
+               file_format='csv'):
+    """Writes the individuals of every every-th frame of a log to out_path
+    as 'csv' or 'parquet' (needs pyarrow)
+    """
+    if file_format not in ('csv', 'parquet'):
+        raise ValueError("Unknown export format %r" % file_format)
+    with trajectory_log(path) as log:
+        data = log.to_dataframe(start, stop, every)
+    if file_format == 'csv':
+        data.to_csv(out_path, index=False)
+    else:
+        data.to_parquet(out_path, index=False)
+    return data
+
+
+def replay_log(path, speed=1, fps=30, start=None, stop=None):
+    """Plays a log back in a pygame window at speed recorded frames per
+    drawn frame, from start until stop or the window is closed
+    """
+    from renderer import pygame_renderer
+
+    with trajectory_log(path) as log:
+        if not len(log.chunks):
+            return
+        renderer = pygame_renderer(int(log.win_x), int(log.win_y))
+        clock = renderer.pygame.time.Clock()
+        position = log.first_frame if start is None else start
+        last_frame = log.last_frame if stop is None else stop
+        running = True
+        while running and position <= last_frame:
+            running = renderer.handle_events()
+            frame_no, pop_size, state = log.seek(int(position))
+            renderer.draw(pop_size, state['x_pos'], state['y_pos'],
+                          state['size'], state['colours'],
+                          ["I %d" % id for id in state['ids']],
+                          state['food_x_pos'], state['food_y_pos'])
+            position += speed
+            clock.tick(fps)
+        renderer.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=1)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--start', type=int, default=None)
+    parser.add_argument('--stop', type=int, default=None)
+    parser.add_argument('--export', default=None,
+                        help="write the frames to this csv or parquet file "
+                             "instead of playing them")
+    parser.add_argument('--every', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.export is None:
+        replay_log(args.path, args.speed, args.fps, args.start, args.stop)
+    else:
+        export_log(args.path, args.export, args.start, args.stop, args.every,
+                   'parquet' if args.export.endswith('.parquet') else 'csv')
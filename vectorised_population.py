@@ -0,0 +1,690 @@
+"""Structure-of-arrays engine for running a population headlessly.
+
+Rather than holding a list of individual objects and stepping each one in
+turn, every individual's state lives in contiguous NumPy arrays and the whole
+population is advanced with one batched step per frame.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from colour_tables import life_colours
+from fitness_stats import gene_fitness_stats, gene_ranges
+from lineage import lineage_store
+from profiling import phase_timer
+from record_store import individual_columns, macro_columns, record_store
+from spatial_index import food_grid
+from telemetry import gene_summary
+
+
+def get_lifetime(energy_use):
+    """Calculates the lifetimes of individuals based on their energy use
+    """
+    constant = 67.5E6
+    lifetime = np.rint(constant / energy_use).astype(np.int64)
+    return lifetime
+
+
+def get_energy_use(size, velocity):
+    """Calculates the energy use of individuals based on their chromosomes
+    """
+    energy_use = 0.5 * size**3 * velocity**2
+    return energy_use
+
+
+# Mean cosine of the heading change of a random walk step, drawn uniformly
+# from -pi/4 to pi/4, which sets how quickly the walk forgets its heading
+walk_correlation = np.sin(np.pi / 4) / (np.pi / 4)
+
+
+def walk_displacement_moments(frames):
+    """Mean displacement along the initial heading and mean squared
+    displacement, in units of the step length, of a correlated random walk
+    after the given numbers of frames
+    """
+    c = walk_correlation
+    mean = c * (1 - c**frames) / (1 - c)
+    mean_square = (frames * (1 + c) / (1 - c)
+                   - 2 * c * (1 - c**frames) / (1 - c)**2)
+    return mean, mean_square
+
+
+def reflect(position, size):
+    """Folds positions back into [0, size) as if reflected off the walls
+    """
+    position = np.mod(position, 2 * size)
+    position = np.where(position >= size, 2 * size - position, position)
+    return np.minimum(position, np.nextafter(size, 0))
+
+
+class vectorised_population:
+    # Per-individual arrays, kept aligned with one another
+    state_fields = {'ids': np.int64, 'x_pos': float, 'y_pos': float,
+                    'current_theta': float, 'velocity': float, 'size': float,
+                    'sense_region_radius': float, 'time_lived': np.int64,
+                    'life_remaining': np.int64, 'foods_eaten': np.int64,
+                    'replications': np.int64}
+
+    # Settings and counters written to snapshots alongside the arrays
+    snapshot_scalars = ('pop_size', 'win_x', 'win_y', 'food_number',
+                        'food_regen', 'speed_up', 'init_velocity', 'init_size',
+                        'init_sense_region_radius', 'dying_time',
+                        'extra_life_time', 'frame_no', 'next_id',
+                        'dead_individuals')
+
+    # Constructor options written to snapshots and passed back on loading
+    snapshot_options = ('backend', 'keep_individual_data')
+
+    def __init__(self, pop_size, food_number, food_regen, seed=None,
+                 init_velocity=1, init_size=30, init_sense_region_radius=100,
+                 lineage=None, backend='numpy', win_x=800, win_y=800,
+                 keep_individual_data=True, fitness_ranges=None,
+                 fitness_bins=16):
+        """Given lineage, every birth is recorded in a lineage_store, kept
+        at lineage if it is a path or in a temporary file if it is True.
+        backend picks the NumPy movement code or the 'numba' compiled
+        kernels, which need the optional numba package. win_x and win_y
+        set the size of the world. Deaths are always summarised in
+        fitness_stats, while a row for every individual is only kept in
+        past_individual_data with keep_individual_data. fitness_stats bins
+        each gene into fitness_bins bins over its range in fitness_ranges,
+        by default a range around the initial genes wide enough for many
+        generations of mutation
+        """
+        if backend not in ('numpy', 'numba'):
+            raise ValueError("Unknown backend %r" % backend)
+        if backend == 'numba':
+            kernels.compiled_kernels()
+        self.backend = backend
+        self.pop_size = pop_size
+        self.win_x = win_x
+        self.win_y = win_y
+        self.food_number = food_number
+        self.food_regen = food_regen
+        self.speed_up = 10
+        self.init_velocity = init_velocity
+        self.init_size = init_size
+        self.init_sense_region_radius = init_sense_region_radius
+        self.dying_time = 200
+        self.extra_life_time = 2000
+        self.frame_no = 0
+        self.next_id = 1
+
+        # Every run draws from its own generator so runs are reproducible
+        self.rng = np.random.default_rng(seed)
+
+        self.macro_store = record_store(macro_columns)
+        self.telemetry = None
+        self.recorder = None
+        self.profiler = phase_timer(enabled=False)
+        self.dead_individuals = 0
+        self.past_individual_store = record_store(
+            dict(individual_columns, Individual=np.int64))
+        self.keep_individual_data = keep_individual_data
+        if fitness_ranges is None:
+            fitness_ranges = gene_ranges(
+                self.init_velocity * self.speed_up, self.init_size,
+                self.init_sense_region_radius)
+        self.fitness_stats = gene_fitness_stats(*fitness_ranges,
+                                                bins=fitness_bins)
+        self.lineage = None
+        if lineage:
+            self.lineage = lineage_store(
+                None if lineage is True else lineage, first_id=self.next_id)
+
+        # Create initial individuals
+        for name, dtype in self.state_fields.items():
+            setattr(self, name, np.empty(0, dtype=dtype))
+        self.add_individuals(
+            np.full(pop_size, float(self.init_velocity * self.speed_up)),
+            np.full(pop_size, float(self.init_size)),
+            np.full(pop_size, float(self.init_sense_region_radius)),
+            self.rng.uniform(0, self.win_x, pop_size),
+            self.rng.uniform(0, self.win_y, pop_size))
+
+        # Create initial food
+        self.food_x_pos = self.rng.uniform(0, self.win_x, food_number)
+        self.food_y_pos = self.rng.uniform(0, self.win_y, food_number)
+        self.food_grid = food_grid(self.win_x, self.win_y)
+        self.food_grid.build(self.food_x_pos, self.food_y_pos)
+
+    def add_individuals(self, velocity, size, sense_region_radius,
+                        x_pos, y_pos, parents=-1):
+        """Appends newly born individuals to the population arrays, with
+        parents giving the ids of their parents or -1 for founders
+        """
+        number = len(velocity)
+        energy_use = get_energy_use(size, velocity)
+        if self.lineage is not None:
+            ids = self.lineage.add_births(parents, self.frame_no, velocity,
+                                          size, sense_region_radius)
+        else:
+            ids = np.arange(self.next_id, self.next_id + number)
+        if self.recorder is not None:
+            self.recorder.born(ids)
+        new_state = {
+            'ids': ids,
+            'x_pos': x_pos,
+            'y_pos': y_pos,
+            'current_theta': self.rng.uniform(0, 2 * np.pi, number),
+            'velocity': velocity,
+            'size': size,
+            'sense_region_radius': sense_region_radius,
+            'time_lived': np.zeros(number, dtype=np.int64),
+            'life_remaining': get_lifetime(energy_use),
+            'foods_eaten': np.zeros(number, dtype=np.int64),
+            'replications': np.zeros(number, dtype=np.int64),
+        }
+        for name in self.state_fields:
+            setattr(self, name, np.concatenate(
+                (getattr(self, name), new_state[name])))
+        self.next_id += number
+        self.pop_size = len(self.ids)
+
+    def keep_individuals(self, mask):
+        """Drops every individual whose entry in mask is False
+        """
+        if self.recorder is not None:
+            self.recorder.died(self.ids[~mask])
+        for name in self.state_fields:
+            setattr(self, name, getattr(self, name)[mask])
+        self.pop_size = len(self.ids)
+
+    def add_food(self, number):
+        """Scatters new food uniformly over the world
+        """
+        x_pos = self.rng.uniform(0, self.win_x, number)
+        y_pos = self.rng.uniform(0, self.win_y, number)
+        if self.recorder is not None:
+            self.recorder.food_added(x_pos, y_pos)
+        self.food_x_pos = np.append(self.food_x_pos, x_pos)
+        self.food_y_pos = np.append(self.food_y_pos, y_pos)
+        self.food_number = len(self.food_x_pos)
+        self.food_grid.build(self.food_x_pos, self.food_y_pos)
+
+    def remove_food(self, eaten_food):
+        """Removes the food at the given indices
+        """
+        if len(eaten_food):
+            if self.recorder is not None:
+                self.recorder.food_eaten(self.food_x_pos[eaten_food],
+                                         self.food_y_pos[eaten_food])
+            keep = np.ones(len(self.food_x_pos), dtype=bool)
+            keep[eaten_food] = False
+            self.food_x_pos = self.food_x_pos[keep]
+            self.food_y_pos = self.food_y_pos[keep]
+            self.food_number = len(self.food_x_pos)
+            self.food_grid.build(self.food_x_pos, self.food_y_pos)
+
+    def nearest_food(self, index):
+        """Finds the nearest food inside the sense region of each individual
+        in index, returning -1 where there is none
+        """
+        return self.food_grid.nearest_within(
+            self.x_pos[index], self.y_pos[index],
+            self.sense_region_radius[index])
+
+    def update_positions(self, moving):
+        """Moves every living individual towards food in its sense region,
+        or in a somewhat random direction, eating food it lands on
+        """
+        index = np.flatnonzero(moving)
+        if self.backend == 'numba':
+            self.update_positions_compiled(index)
+            return
+        target = self.nearest_food(index)
+        seeking = target >= 0
+
+        # Distance and direction to chosen food
+        seek_index = index[seeking]
+        seek_target = target[seeking]
+        dx = self.food_x_pos[seek_target] - self.x_pos[seek_index]
+        dy = self.food_y_pos[seek_target] - self.y_pos[seek_index]
+        distance = np.hypot(dx, dy)
+        distance_to_food = np.floor(distance)
+
+        # Eat the food once upon it, the first individual to arrive wins
+        on_food = distance_to_food == 0
+        eaten_food, first = np.unique(seek_target[on_food], return_index=True)
+        eaters = seek_index[on_food][first]
+        self.foods_eaten[eaters] += 1
+        self.life_remaining[eaters] += self.extra_life_time
+
+        # Otherwise move directly towards food
+        approach = ~on_food
+        step = np.minimum(self.velocity[seek_index[approach]],
+                          distance_to_food[approach])
+        self.x_pos[seek_index[approach]] += (
+            dx[approach] / distance[approach] * step)
+        self.y_pos[seek_index[approach]] += (
+            dy[approach] / distance[approach] * step)
+
+        # Random walk for those without food nearby
+        walk_index = index[~seeking]
+        theta = self.current_theta[walk_index] + self.rng.uniform(
+            -np.pi / 4, np.pi / 4, len(walk_index))
+        self.current_theta[walk_index] = theta
+        x_update = np.sin(theta) * self.velocity[walk_index]
+        y_update = np.cos(theta) * self.velocity[walk_index]
+
+        # Stop individuals going off screen by reversing direction
+        new_x = self.x_pos[walk_index] + x_update
+        new_y = self.y_pos[walk_index] + y_update
+        x_update[(new_x >= self.win_x) | (new_x < 0)] *= -1
+        y_update[(new_y >= self.win_y) | (new_y < 0)] *= -1
+        self.x_pos[walk_index] += x_update
+        self.y_pos[walk_index] += y_update
+
+        self.remove_food(eaten_food)
+
+    def update_positions_compiled(self, index):
+        """update_positions through the compiled kernels, drawing the same
+        random turns as the NumPy code
+        """
+        nearest_food_kernel, move_kernel = kernels.compiled_kernels()
+        grid = self.food_grid
+        target = np.full(len(index), -1, dtype=np.int64)
+        if len(self.food_x_pos):
+            target = nearest_food_kernel(
+                self.x_pos[index], self.y_pos[index],
+                self.sense_region_radius[index], self.food_x_pos,
+                self.food_y_pos, grid.cell_start, grid.food_order,
+                float(grid.static_cell_size), grid.static_n_x,
+                grid.static_n_y, float(grid.x_min), float(grid.y_min))
+        turns = self.rng.uniform(-np.pi / 4, np.pi / 4,
+                                 np.count_nonzero(target < 0))
+        eaten = move_kernel(
+            index, target, turns, self.x_pos, self.y_pos, self.current_theta,
+            self.velocity, self.foods_eaten, self.life_remaining,
+            self.extra_life_time, self.food_x_pos, self.food_y_pos,
+            float(self.win_x), float(self.win_y))
+        self.remove_food(np.flatnonzero(eaten))
+
+    def replicate(self, moving):
+        """Replicates every individual that has eaten another two foods,
+        with mutations from its parent
+        """
+        parents = np.flatnonzero(
+            moving & (self.foods_eaten % 2 == 0) &
+            (self.foods_eaten // 2 != self.replications))
+        if not len(parents):
+            return
+        self.replications[parents] += 1
+        self.add_individuals(
+            self.rng.normal(self.velocity[parents], 1 / 3),
+            self.rng.normal(self.size[parents], 10 / 3),
+            self.rng.normal(self.sense_region_radius[parents], 100 / 3),
+            self.x_pos[parents], self.y_pos[parents], self.ids[parents])
+
+    def jump_random_walks(self, index, frames):
+        """Moves the selected individuals over a random walk of the given
+        numbers of frames in one step, drawing the end point from the
+        walk's mean and spread rather than taking each step
+        """
+        index = index[frames > 0]
+        frames = frames[frames > 0]
+        theta = self.current_theta[index]
+        velocity = self.velocity[index]
+        mean, mean_square = walk_displacement_moments(frames)
+        spread = np.sqrt(np.maximum(mean_square - mean**2, 0) / 2) * velocity
+        x_update = (np.sin(theta) * mean * velocity
+                    + spread * self.rng.standard_normal(len(index)))
+        y_update = (np.cos(theta) * mean * velocity
+                    + spread * self.rng.standard_normal(len(index)))
+        self.x_pos[index] = reflect(self.x_pos[index] + x_update, self.win_x)
+        self.y_pos[index] = reflect(self.y_pos[index] + y_update, self.win_y)
+
+        # Heading after a sum of uniform turns
+        self.current_theta[index] = theta + self.rng.normal(
+            0, np.pi / 4 * np.sqrt(frames / 3))
+
+    def fast_forward(self, span):
+        """Advances the whole population by span frames at once. Individuals
+        without food in their sense region jump over a random walk, and
+        those with food move straight to it, eating on the frame they would
+        arrive. Only the gene statistics are kept faithful, not the paths,
+        and one frame is recorded per span
+        """
+        timer = self.profiler
+        timer.mark()
+        start_frame = self.frame_no
+        self.frame_no += span
+
+        # Food regeneration, all placed at the start of the span
+        if self.food_regen:
+            food_regen_wait_time = 1000 / (self.food_regen * self.speed_up)
+            frames = np.arange(start_frame + 1, self.frame_no + 1)
+            regenerated = np.count_nonzero(frames % food_regen_wait_time == 0)
+            if regenerated:
+                self.add_food(regenerated)
+        timer.lap('food regeneration')
+
+        # Frames of the span each individual still moves for
+        moving_frames = np.clip(
+            self.life_remaining - self.time_lived - 1, 0, span)
+        index = np.flatnonzero(moving_frames)
+        target = self.nearest_food(index)
+        seeking = target >= 0
+        walk_frames = np.zeros(self.pop_size, dtype=np.int64)
+        walk_frames[index[~seeking]] = moving_frames[index[~seeking]]
+
+        # Frame each seeker would eat on, one move of at most velocity per
+        # frame and then a frame to eat
+        seek_index = index[seeking]
+        seek_target = target[seeking]
+        dx = self.food_x_pos[seek_target] - self.x_pos[seek_index]
+        dy = self.food_y_pos[seek_target] - self.y_pos[seek_index]
+        distance = np.hypot(dx, dy)
+        moves = np.ceil(np.floor(distance) / self.velocity[seek_index])
+        moves = moves.astype(np.int64)
+        arriving = moves + 1 <= moving_frames[seek_index]
+
+        # Seekers that do not arrive close in along a straight line
+        short = ~arriving
+        short_index = seek_index[short]
+        step = np.minimum(
+            self.velocity[short_index] * moving_frames[short_index],
+            distance[short])
+        self.x_pos[short_index] += dx[short] / distance[short] * step
+        self.y_pos[short_index] += dy[short] / distance[short] * step
+
+        # The first to arrive at a piece of food eats it, ties going to the
+        # lowest index. The rest of the span is spent random walking
+        arrive_index = seek_index[arriving]
+        arrive_target = seek_target[arriving]
+        arrive_frame = moves[arriving] + 1
+        order = np.lexsort((arrive_index, arrive_frame))
+        eaten_food, first = np.unique(arrive_target[order],
+                                      return_index=True)
+        eaters = arrive_index[order][first]
+        self.x_pos[arrive_index] = self.food_x_pos[arrive_target]
+        self.y_pos[arrive_index] = self.food_y_pos[arrive_target]
+        walk_frames[arrive_index] = (moving_frames[arrive_index]
+                                     - arrive_frame)
+        walk_frames[eaters] = span - arrive_frame[order][first]
+        self.foods_eaten[eaters] += 1
+        self.life_remaining[eaters] += self.extra_life_time
+        self.jump_random_walks(np.arange(self.pop_size), walk_frames)
+
+        self.remove_food(eaten_food)
+        timer.lap('movement')
+
+        # Replicate individuals for every two foods they eat
+        ate = np.zeros(self.pop_size, dtype=bool)
+        ate[eaters] = True
+        self.replicate(ate)
+        timer.lap('replication')
+
+        # Remove individuals that have finished dying, counting their time
+        # lived up to the frame they died on
+        self.time_lived[:len(moving_frames)] += span
+        last_frame = self.life_remaining + self.dying_time + 1
+        dead = self.time_lived > self.life_remaining + self.dying_time
+        self.time_lived[dead] = last_frame[dead]
+        if dead.any():
+            dead_index = np.flatnonzero(dead)
+            self.add_individuals_to_data(dead_index)
+            self.dead_individuals += len(dead_index)
+            self.keep_individuals(~dead)
+        timer.lap('dead removal')
+
+        self.record_frame()
+        timer.lap('data recording')
+
+    def individual_rows(self, index, alive):
+        """Genes and performance of the selected individuals as columns of
+        past_individual_data
+        """
+        return {'Individual': self.ids[index],
+                'Alive at End': np.full(len(index), alive),
+                'Time Lived': self.time_lived[index],
+                'Food Eaten': self.foods_eaten[index],
+                'Replications': self.replications[index],
+                'Size': self.size[index],
+                'Velocity': self.velocity[index],
+                'Sense': self.sense_region_radius[index]}
+
+    def add_individuals_to_data(self, index):
+        """Records the genes and performance of the selected individuals as
+        they die
+        """
+        self.fitness_stats.add(
+            self.velocity[index], self.size[index],
+            self.sense_region_radius[index], self.time_lived[index],
+            self.foods_eaten[index], self.replications[index])
+        if self.keep_individual_data:
+            self.past_individual_store.extend(
+                self.individual_rows(index, False))
+        if self.lineage is not None:
+            self.lineage.record_outcomes(
+                self.ids[index], self.foods_eaten[index],
+                self.replications[index], self.frame_no)
+
+    def individual_records(self):
+        """Records of every individual that has died followed by those still
+        alive. The living are only added when read, so that they are never
+        stored twice by a run carried on from a snapshot
+        """
+        store = self.past_individual_store
+        records = store.records[:len(store)]
+        if not self.keep_individual_data:
+            return records.copy()
+        living = np.empty(self.pop_size, dtype=store.dtype)
+        for name, values in self.individual_rows(
+                np.arange(self.pop_size), True).items():
+            living[name] = values
+        return np.concatenate((records, living))
+
+    def step(self):
+        """Advances the whole population by a single frame
+        """
+        timer = self.profiler
+        timer.mark()
+        self.frame_no += 1
+
+        # Food regeneration
+        if self.food_regen:
+            food_regen_wait_time = 1000 / (self.food_regen * self.speed_up)
+            if self.frame_no % food_regen_wait_time == 0:
+                self.add_food(1)
+        timer.lap('food regeneration')
+
+        # Keep moving while alive
+        self.time_lived += 1
+        moving = self.time_lived < self.life_remaining
+        self.update_positions(moving)
+        timer.lap('movement')
+
+        # Replicate individuals for every two foods they eat
+        self.replicate(moving)
+        timer.lap('replication')
+
+        # Remove individuals that have finished dying
+        dead = self.time_lived > self.life_remaining + self.dying_time
+        if dead.any():
+            dead_index = np.flatnonzero(dead)
+            self.add_individuals_to_data(dead_index)
+            self.dead_individuals += len(dead_index)
+            self.keep_individuals(~dead)
+        timer.lap('dead removal')
+
+        self.record_frame()
+        timer.lap('data recording')
+
+    def colours(self):
+        """Colours of the living population, fading from blue to purple over
+        the last frames of life and red while dying
+        """
+        return life_colours(self.life_remaining - self.time_lived)
+
+    def view_state(self):
+        """Positions, sizes, colours and genes of the living population and
+        the food positions, as published to a viewer
+        """
+        return {'ids': self.ids, 'x_pos': self.x_pos, 'y_pos': self.y_pos,
+                'size': self.size, 'colours': self.colours(),
+                'velocity': self.velocity,
+                'sense_region_radius': self.sense_region_radius,
+                'food_x_pos': self.food_x_pos, 'food_y_pos': self.food_y_pos}
+
+    def record_state(self, food=True):
+        """Positions, life left and genes of the living population and, with
+        food, the food positions, as logged by a trajectory_recorder
+        """
+        state = {'ids': self.ids, 'x_pos': self.x_pos, 'y_pos': self.y_pos,
+                 'life_left': self.life_remaining - self.time_lived,
+                 'size': self.size, 'velocity': self.velocity,
+                 'sense_region_radius': self.sense_region_radius}
+        if food:
+            state['food_x_pos'] = self.food_x_pos
+            state['food_y_pos'] = self.food_y_pos
+        return state
+
+    def record_frame(self):
+        """Summarises the frame, streaming it to the telemetry writer when
+        there is one rather than keeping it in memory
+        """
+        row = {'frame': self.frame_no,
+               'population': self.pop_size,
+               'food_number': self.food_number}
+        if self.telemetry is None:
+            self.macro_store.append(row)
+        elif self.telemetry.due(self.frame_no):
+            row.update(gene_summary(self.velocity, self.size,
+                                    self.sense_region_radius))
+            self.telemetry.record(row)
+
+    def simulate(self, max_frames=None, checkpoint_every=None,
+                 checkpoint_path=None, telemetry=None, profile=False,
+                 fast_forward=None, viewer=None, recorder=None):
+        """Runs the population until it dies out or max_frames is reached,
+        snapshotting the world to checkpoint_path every so many frames.
+        Given a telemetry_writer, frame data is streamed to it instead of
+        being kept in macro_pop_data. With profile, each phase of a frame is
+        timed in self.profiler and reported at the end. Given fast_forward,
+        the population is advanced that many frames at a time with
+        self.fast_forward. Given a viewer's snapshot_buffer, the world is
+        published to it whenever it is due. Given a trajectory_recorder,
+        the frames it is due are logged to it for replay
+        """
+        self.telemetry = telemetry
+        self.recorder = recorder
+        self.profiler = phase_timer(enabled=profile)
+        last_checkpoint = self.frame_no
+        while self.pop_size and self.frame_no != max_frames:
+            if fast_forward:
+                span = fast_forward
+                if max_frames is not None:
+                    span = min(span, max_frames - self.frame_no)
+                self.fast_forward(span)
+            else:
+                self.step()
+            if recorder is not None and recorder.due(self.frame_no):
+                recorder.record(self.frame_no, self.pop_size,
+                                self.record_state(recorder.starting_chunk))
+            if viewer is not None and viewer.due():
+                viewer.publish(self.frame_no, self.pop_size,
+                               self.view_state())
+            if (checkpoint_every and
+                    self.frame_no - last_checkpoint >= checkpoint_every):
+                self.save_snapshot(checkpoint_path)
+                last_checkpoint = self.frame_no
+        if telemetry is not None:
+            telemetry.flush()
+            self.telemetry = None
+        if recorder is not None:
+            recorder.flush()
+            self.recorder = None
+
+        if profile:
+            print(self.profiler.report())
+
+        # Lineage shows how the living have fared so far
+        if self.lineage is not None:
+            self.lineage.record_outcomes(self.ids, self.foods_eaten,
+                                         self.replications)
+
+    def save_snapshot(self, path):
+        """Writes the full world state, RNG state and history to an
+        uncompressed .npz file, replacing any earlier snapshot at path
+        """
+        arrays = {name: getattr(self, name) for name in self.state_fields}
+        arrays['food_x_pos'] = self.food_x_pos
+        arrays['food_y_pos'] = self.food_y_pos
+        for name in self.snapshot_scalars + self.snapshot_options:
+            arrays[name] = np.asarray(getattr(self, name))
+        arrays['rng_state'] = np.asarray(
+            json.dumps(self.rng.bit_generator.state))
+        arrays['macro_records'] = self.macro_store.records[
+            :len(self.macro_store)]
+        arrays['individual_records'] = self.past_individual_store.records[
+            :len(self.past_individual_store)]
+        for name, values in self.fitness_stats.state().items():
+            arrays['fitness_%s' % name] = values
+
+        # Write to a temporary file first so a crash never leaves a
+        # half-written snapshot in place of a good one
+        temp_path = "%s.tmp" % path
+        with open(temp_path, 'wb') as snapshot_file:
+            np.savez(snapshot_file, **arrays)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load_snapshot(cls, path):
+        """Recreates a population exactly as it was when snapshotted, so
+        that simulating it carries on the original run
+        """
+        with np.load(path) as snapshot:
+            pop = cls(pop_size=0, food_number=0, food_regen=0,
+                      **{name: snapshot[name].item()
+                         for name in cls.snapshot_options})
+            for name in cls.state_fields:
+                setattr(pop, name, snapshot[name])
+            pop.food_x_pos = snapshot['food_x_pos']
+            pop.food_y_pos = snapshot['food_y_pos']
+            for name in cls.snapshot_scalars:
+                setattr(pop, name, snapshot[name].item())
+            pop.food_grid = food_grid(pop.win_x, pop.win_y)
+            pop.rng.bit_generator.state = json.loads(
+                snapshot['rng_state'].item())
+            pop.macro_store.extend(snapshot['macro_records'])
+            pop.past_individual_store.extend(snapshot['individual_records'])
+            pop.fitness_stats = gene_fitness_stats.from_state(
+                {name[len('fitness_'):]: snapshot[name]
+                 for name in snapshot.files if name.startswith('fitness_')})
+        pop.food_grid.build(pop.food_x_pos, pop.food_y_pos)
+        return pop
+
+    @property
+    def past_individual_data(self):
+        """Genes and performance of every individual that has lived
+        """
+        return pd.DataFrame(self.individual_records())
+
+    @property
+    def macro_pop_data(self):
+        """Population size and food number for each frame so far
+        """
+        return self.macro_store.to_dataframe()
+
+    def plot_summary(self):
+        import matplotlib.pyplot as plt
+
+        plt.figure()
+        plt.xlabel("Frame")
+        plt.ylabel("#")
+        plt.plot(self.macro_pop_data.frame,
+                 self.macro_pop_data.population, label="Population")
+        plt.plot(self.macro_pop_data.frame,
+                 self.macro_pop_data.food_number, label="Food Number")
+        plt.legend()
+        plt.show()
+
+
+if __name__ == "__main__":
+    pop = vectorised_population(pop_size=10, food_number=100, food_regen=5)
+    pop.simulate()
+    pop.plot_summary()
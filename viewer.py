@@ -0,0 +1,213 @@
+"""Viewing a running simulation from a separate process.
+
+The simulation publishes snapshots of the world into a double-buffered
+block of shared memory and carries on stepping, while a viewer process
+draws the latest complete snapshot in pygame and the live gene plot at its
+own frame rate. A slow redraw then never holds up evolution. Each buffer
+has a sequence number that is odd while it is being written, so the viewer
+retries rather than drawing a half-written snapshot.
+"""
+import time
+from multiprocessing import Process, shared_memory
+
+import numpy as np
+
+# Rows of each snapshot buffer holding per-individual values
+individual_rows = ('ids', 'x_pos', 'y_pos', 'size', 'red', 'green', 'blue',
+                   'velocity', 'sense_region_radius')
+
+# Header slots: the active buffer, a closed flag, then for each buffer its
+# sequence number, frame, population size, individuals and food stored
+header_size = 2 + 2 * 5
+
+
+class snapshot_buffer:
+    def __init__(self, capacity=100000, food_capacity=100000, name=None,
+                 publish_interval=1 / 60):
+        """Creates the shared memory, or attaches to the existing block
+        called name. Snapshots hold at most capacity individuals and
+        food_capacity pieces of food, and are published at most once per
+        publish_interval seconds
+        """
+        self.capacity = capacity
+        self.food_capacity = food_capacity
+        self.publish_interval = publish_interval
+        self.last_publish = -np.inf
+        slot_size = len(individual_rows) * capacity + 2 * food_capacity
+        size = 8 * (header_size + 2 * slot_size)
+        if name is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.name = self.memory.name
+        self.header = np.ndarray(header_size, dtype=np.int64,
+                                 buffer=self.memory.buf)
+        if name is None:
+            self.header[:] = 0
+        self.slots = []
+        for slot in range(2):
+            offset = 8 * (header_size + slot * slot_size)
+            individuals = np.ndarray(
+                (len(individual_rows), capacity), dtype=float,
+                buffer=self.memory.buf, offset=offset)
+            food = np.ndarray(
+                (2, food_capacity), dtype=float, buffer=self.memory.buf,
+                offset=offset + 8 * len(individual_rows) * capacity)
+            self.slots.append((individuals, food))
+
+    def slot_header(self, slot):
+        """A view of one buffer's sequence number, frame, population size,
+        individuals and food stored
+        """
+        return self.header[2 + 5 * slot:7 + 5 * slot]
+
+    @property
+    def closed(self):
+        return bool(self.header[1])
+
+    def due(self):
+        """Whether enough time has passed to publish another snapshot
+        """
+        return time.monotonic() - self.last_publish >= self.publish_interval
+
+    def publish(self, frame_no, pop_size, state):
+        """Writes a snapshot into the inactive buffer and makes it active.
+        state holds the view_state of a population
+        """
+        self.last_publish = time.monotonic()
+        slot = 1 - self.header[0]
+        individuals, food = self.slots[slot]
+        slot_header = self.slot_header(slot)
+        count = min(len(state['ids']), self.capacity)
+        food_count = min(len(state['food_x_pos']), self.food_capacity)
+
+        slot_header[0] += 1
+        colours = np.asarray(state['colours'])
+        for row, name in enumerate(individual_rows):
+            if name in ('red', 'green', 'blue'):
+                values = colours[:count, ('red', 'green', 'blue').index(name)]
+            else:
+                values = np.asarray(state[name])[:count]
+            individuals[row, :count] = values
+        food[0, :food_count] = np.asarray(state['food_x_pos'])[:food_count]
+        food[1, :food_count] = np.asarray(state['food_y_pos'])[:food_count]
+        slot_header[1:] = (frame_no, pop_size, count, food_count)
+        slot_header[0] += 1
+        self.header[0] = slot
+
+    def read(self):
+        """Copies out the latest complete snapshot as the frame, population
+        size, a dict of individual values and the food positions, or
+        returns None if nothing has been published yet
+        """
+        while True:
+            slot = self.header[0]
+            slot_header = self.slot_header(slot)
+            sequence = slot_header[0]
+            if sequence == 0:
+                return None
+            if sequence % 2:
+                continue
+            frame_no, pop_size, count, food_count = slot_header[1:]
+            individuals, food = self.slots[slot]
+            values = individuals[:, :count].copy()
+            food_positions = food[:, :food_count].copy()
+            if slot_header[0] == sequence:
+                break
+        state = dict(zip(individual_rows, values))
+        return frame_no, pop_size, state, food_positions
+
+    def close(self):
+        """Tells viewers no more snapshots are coming
+        """
+        self.header[1] = 1
+
+    def release(self, unlink=False):
+        """Detaches from the shared memory, freeing it if unlink
+        """
+        self.header = None
+        self.slots = None
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def view_snapshots(name, capacity, food_capacity, win_x, win_y, fps=30,
+                   max_velocity=20, plot=True):
+    """Viewer process loop, drawing the latest snapshot in pygame and the
+    live gene plot until the window is closed or the simulation finishes
+    """
+    from renderer import pygame_renderer
+
+    buffer = snapshot_buffer(capacity, food_capacity, name=name)
+    renderer = pygame_renderer(win_x, win_y)
+    clock = renderer.pygame.time.Clock()
+    latest = {}
+
+    def genes():
+        state = latest.get('state')
+        if state is None:
+            return [], [], []
+        return (state['velocity'], state['size'],
+                state['sense_region_radius'])
+
+    live_plot = None
+    if plot:
+        from live_plot import live_gene_plot
+        live_plot = live_gene_plot(genes, max_velocity)
+
+    running = True
+    while running:
+        running = renderer.handle_events()
+        finished = buffer.closed
+        snapshot = buffer.read()
+        if snapshot is not None:
+            frame_no, pop_size, state, food_positions = snapshot
+            latest['state'] = state
+            renderer.draw(
+                pop_size, state['x_pos'], state['y_pos'], state['size'],
+                np.column_stack((state['red'], state['green'],
+                                 state['blue'])),
+                ["I %d" % id for id in state['ids']],
+                food_positions[0], food_positions[1])
+        if live_plot is not None:
+            live_plot.refresh()
+        if finished:
+            running = False
+        clock.tick(fps)
+
+    if live_plot is not None:
+        live_plot.refresh(force=True)
+    renderer.close()
+    buffer.release()
+
+
+def simulate_with_viewer(pop, max_frames=None, fps=30, plot=True,
+                         capacity=100000, food_capacity=100000, **kwargs):
+    """Runs a population headlessly in this process while a viewer process
+    draws it at fps frames per second. Extra keyword arguments are passed
+    to the simulation
+    """
+    stepped = hasattr(pop, 'step_frame')
+    if stepped:
+        pop.start(headless=True, max_frames=max_frames, **kwargs)
+    buffer = snapshot_buffer(capacity, food_capacity)
+    viewer = Process(target=view_snapshots, args=(
+        buffer.name, capacity, food_capacity, pop.win_x, pop.win_y, fps,
+        2 * pop.init_velocity * pop.speed_up, plot))
+    viewer.start()
+    try:
+        if stepped:
+            while pop.step_frame():
+                if buffer.due():
+                    buffer.publish(pop.frame_no, pop.pop_size,
+                                   pop.view_state())
+            pop.finish()
+        else:
+            pop.simulate(max_frames=max_frames, viewer=buffer, **kwargs)
+        buffer.publish(pop.frame_no, pop.pop_size, pop.view_state())
+    finally:
+        buffer.close()
+        viewer.join()
+        buffer.release(unlink=True)
+    return pop